@@ -0,0 +1,81 @@
+"""benchmarks/attribute_memory.py
+
+Benchmarks the memory held per node by declared attributes stored by position versus in a per tag dict, as they were
+Copyright (C) 2015 Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+import sys
+import tracemalloc
+
+from blox.attributes import Attribute
+from blox.dom import TD, A, Div, Img, Input
+
+NODES = 200000
+benchmarks = {}
+
+
+class PerTagDictAttribute(object):
+    '''How declared attributes used to be stored: in a plain dict, allocated for each tag, keyed by name'''
+    __slots__ = ('name', )
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        return obj._attributes[self.name]
+
+    def __set__(self, obj, value):
+        if getattr(obj, '_attributes', None) is None:
+            obj._attributes = {}
+        obj._attributes[self.name] = value
+        obj._changed()
+
+
+def per_tag_dict(node_type):
+    '''Returns a subclass of node_type storing its declared attributes the way they used to be stored'''
+    attributes = {name: PerTagDictAttribute(attribute.name) for name, attribute in
+                  node_type.attribute_descriptors.items() if isinstance(attribute, Attribute)}
+    attributes['__slots__'] = ()
+    return type(node_type)(node_type.__name__, (node_type, ), attributes)
+
+
+def bytes_per_node(node_type, attributes):
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    nodes = [node_type(**attributes) for _ in range(NODES)]
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return (used - sys.getsizeof(nodes)) / NODES
+
+
+for name, node_type, attributes in (('td with style and colspan', TD, dict(style='color: red', colspan='2')),
+                                    ('div with style', Div, dict(style='color: red')),
+                                    ('div without attributes', Div, {}),
+                                    ('a with href', A, dict(href='/')),
+                                    ('img with src and alt', Img, dict(src='a.png', alt='a')),
+                                    ('input with type and value', Input, dict(type='text', value='a'))):
+    previous = per_tag_dict(node_type)
+    assert previous(**attributes).render() == node_type(**attributes).render()
+    assert not getattr(previous(**attributes), '_values', None)
+    benchmarks['{0} (per tag dict)'.format(name)] = bytes_per_node(previous, attributes)
+    benchmarks['{0} ({1})'.format(name, 'sparse' if node_type.sparse_values else 'compact')] = bytes_per_node(
+        node_type, attributes)
+
+for name, size in benchmarks.items():
+    print('{0} bytes per node: {1:.1f}'.format(name, size))
@@ -0,0 +1,47 @@
+"""benchmarks/convert_fragments.py
+
+Benchmarks turning distinct user supplied html fragments into blox by generating code and by converting directly
+Copyright (C) 2015 Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+import time
+from contextlib import contextmanager
+
+import blox.compile
+
+FRAGMENTS = ['<div class="comment"><p>Comment {0} with <b>bold</b> and <a href="/user/{0}">a link</a></p>'
+             '<ul><li>first</li><li>second <i>{0}</i></li></ul></div>'.format(number) for number in range(1000)]
+benchmarks = {}
+
+
+@contextmanager
+def benchmark(name):
+    start = time.time()
+    yield
+    benchmarks[name] = time.time() - start
+
+
+with benchmark('compile.string'):
+    for fragment in FRAGMENTS:
+        blox.compile.string(fragment, use_short=False)().render()
+
+with benchmark('compile.convert'):
+    for fragment in FRAGMENTS:
+        blox.compile.convert(fragment).render()
+
+for name, total in benchmarks.items():
+    print('{0} Total Time ({1} fragments): {2}'.format(name, len(FRAGMENTS), total))
@@ -0,0 +1,68 @@
+"""benchmarks/cython_templates.py
+
+Benchmarks building and rendering a precompiled template as a pure Python module and as a Cython extension
+Copyright (C) 2015 Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import blox.compile
+from blox.precompiled import Templates
+
+BUILDS = 200
+benchmarks = {}
+TEMPLATE = '<div id="page"><table>{0}</table></div>'.format(''.join(
+    '<tr id="row{0}"><td class="name">Row {0}</td><td><b>{0}</b></td></tr>'.format(row) for row in range(100)))
+
+
+@contextmanager
+def benchmark(name):
+    start = time.time()
+    yield
+    benchmarks[name] = time.time() - start
+
+
+def benchmark_template(name, template):
+    with benchmark('{0} build'.format(name)):
+        for _ in range(BUILDS):
+            template()
+
+    built = template()
+    with benchmark('{0} render'.format(name)):
+        for _ in range(BUILDS):
+            built.render()
+
+
+with tempfile.TemporaryDirectory() as directory:
+    source = os.path.join(directory, 'source')
+    output = os.path.join(directory, 'output')
+    os.makedirs(source)
+    with open(os.path.join(source, 'page.html'), 'w') as template_file:
+        template_file.write(TEMPLATE)
+
+    blox.compile.directory(source, output, processes=1)
+    benchmark_template('Python', Templates(output, extensions='')['page.html'])
+    if blox.compile.cythonize(os.path.join(output, 'page.py'), os.path.join(output, '__bloxcython__')):
+        benchmark_template('Cython', Templates(output)['page.html'])
+    else:
+        print('Cython (or a C compiler) is not available, only benchmarking pure Python')
+
+for name, total in benchmarks.items():
+    print('{0} Total Time ({1} times): {2}'.format(name, BUILDS, total))
@@ -0,0 +1,105 @@
+"""benchmarks/deep_trees.py
+
+Benchmarks walking and rendering deep and wide trees with the explicit stack versus the recursive implementation
+Copyright (C) 2015 Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+import sys
+import time
+from contextlib import contextmanager
+
+from blox.base import Blox
+from blox.dom import Div, Span
+from blox.text import Text
+
+RENDERS = 20
+DEEP = 10000
+RECURSION_SAFE_DEEP = 200
+WIDE = 10000
+benchmarks = {}
+
+
+class RecursiveDiv(Div):
+    '''How TagWithChildren used to output: recursing into every child'''
+    __slots__ = ()
+
+    def output(self, to=None, *args, **kwargs):
+        to.write(self.start_tag)
+        for blok in self.blox:
+            blok.output(to=to, *args, **kwargs)
+        to.write(self.end_tag)
+
+
+def recursive_walk(blox):
+    '''How Blox.walk used to work: through nested generators'''
+    for blok in blox:
+        yield blok
+        if hasattr(blok, '_blox'):
+            yield from recursive_walk(blok.blox)
+
+
+@contextmanager
+def benchmark(name):
+    start = time.time()
+    try:
+        yield
+        benchmarks[name] = time.time() - start
+    except RecursionError:
+        benchmarks[name] = 'RecursionError'
+
+
+def deep(div_type, levels):
+    root = current = div_type()
+    for level in range(levels):
+        current = current(div_type(Text(str(level))))
+    return root
+
+
+def wide(div_type, width):
+    return div_type(*(div_type(Span(Text(str(column)))) for column in range(width)))
+
+
+for name, levels in (('deep', DEEP), ('recursion safe deep', RECURSION_SAFE_DEEP)):
+    for implementation, div_type, walk in (('recursive', RecursiveDiv, recursive_walk),
+                                           ('explicit stack', Div, Blox.walk)):
+        tree = deep(div_type, levels)
+        with benchmark('{0} {1} render'.format(implementation, name)):
+            for _ in range(RENDERS):
+                tree.render()
+        with benchmark('{0} {1} walk'.format(implementation, name)):
+            for _ in range(RENDERS):
+                list(walk(Blox((tree, ))))
+        if div_type is Div:
+            with benchmark('{0} {1} iter_render'.format(implementation, name)):
+                for _ in range(RENDERS):
+                    ''.join(tree.iter_render())
+            with benchmark('{0} {1} render_bytes'.format(implementation, name)):
+                for _ in range(RENDERS):
+                    tree.render_bytes()
+
+for implementation, div_type, walk in (('recursive', RecursiveDiv, recursive_walk), ('explicit stack', Div, Blox.walk)):
+    tree = wide(div_type, WIDE)
+    with benchmark('{0} wide render'.format(implementation)):
+        for _ in range(RENDERS):
+            tree.render()
+    with benchmark('{0} wide walk'.format(implementation)):
+        for _ in range(RENDERS):
+            list(walk(Blox((tree, ))))
+
+print('Recursion limit: {0}'.format(sys.getrecursionlimit()))
+for name, total in benchmarks.items():
+    print('{0} Total Time ({1} times): {2}'.format(name, RENDERS, total))
@@ -0,0 +1,63 @@
+"""benchmarks/escaping.py
+
+Benchmarks how quickly blox can render a large 10x1000 HTML table built from untrusted (escaped) text
+Copyright (C) 2015 Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+import time
+from contextlib import contextmanager
+from html import escape as html_escape
+
+from blox.dom import TD, TR, Table
+from blox.text import Text, UnsafeText
+
+RENDERS = 20
+benchmarks = {}
+TABLE = [dict(a=1, b='<b>', c=3, d='&', e=5, f=6, g=7, h=8, i=9, j=10) for _ in list(range(1000))]
+
+
+class EscapedPerRender(Text):
+    '''How UnsafeText used to render: escaping its value every single time it is output'''
+    __slots__ = ()
+
+    def output(self, to=None, *args, **kwargs):
+        to.write(html_escape(str(self._value), quote=False))
+
+
+@contextmanager
+def benchmark(name):
+    start = time.time()
+    yield
+    benchmarks[name] = time.time() - start
+
+
+def benchmark_text(text_type):
+    table = Table()
+    for row in TABLE:
+        table_row = table(TR())
+        for column in row.values():
+            table_row(TD(text_type(column)))
+
+    with benchmark(text_type.__name__):
+        for _ in range(RENDERS):
+            table.render()
+
+
+benchmark_text(EscapedPerRender)
+benchmark_text(UnsafeText)
+for name, total in benchmarks.items():
+    print('{0} Total Time ({1} renders): {2}'.format(name, RENDERS, total))
@@ -0,0 +1,72 @@
+"""benchmarks/indexed_queries.py
+
+Benchmarks querying wide and deep trees through an index versus walking them
+Copyright (C) 2015 Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+import time
+
+from blox.base import Blox
+from blox.dom import Div, Span
+
+QUERIES = 1000
+WIDE = 50000
+DEEP = 1000
+benchmarks = {}
+
+
+def wide(width):
+    return Div(*(Span(id='cell{0}'.format(column), classes=('cell', 'highlighted' if column % 1000 == 0 else ''))
+                 for column in range(width)))
+
+
+def deep(levels):
+    root = current = Div()
+    for level in range(levels):
+        current = current(Div(id='level{0}'.format(level), classes=('highlighted' if level % 100 == 0 else '', )))
+    return root
+
+
+def benchmark(name, query, times=QUERIES):
+    start = time.time()
+    for _ in range(times):
+        query()
+    benchmarks[name] = (times, time.time() - start)
+
+
+for name, tree, found in (('wide', wide(WIDE), 'cell{0}'.format(WIDE - 1)),
+                          ('deep', deep(DEEP), 'level{0}'.format(DEEP - 1))):
+    blox = Blox((tree, ))
+    benchmark('walked {0} query(id=...)'.format(name), lambda: blox.query(id=found), times=10)
+    tree.index()
+    benchmark('indexed {0} query(id=...)'.format(name), lambda: blox.query(id=found))
+    benchmark('indexed {0} query(classes=[...]) of {1}'.format(name, len(blox.query(classes=['highlighted']))),
+              lambda: blox.query(classes=['highlighted']))
+
+tree = wide(WIDE).index()
+blox = Blox((tree, ))
+
+
+def insert_then_query():
+    tree(Span(classes=('highlighted', )), position=WIDE // 2)
+    blox.query(classes=['highlighted'])
+
+
+benchmark('indexed wide insert then query(classes=[...])', insert_then_query)
+
+for name, (times, total) in benchmarks.items():
+    print('{0} Total Time ({1} times): {2}'.format(name, times, total))
@@ -19,7 +19,11 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 OTHER DEALINGS IN THE SOFTWARE.
 
 '''
-import cgi
+from blox.escaping import escape_attribute
+
+MODIFIERS = ('add', 'append', 'clear', 'difference_update', 'discard', 'extend', 'insert', 'intersection_update',
+             'pop', 'popitem', 'remove', 'reverse', 'setdefault', 'sort', 'symmetric_difference_update', 'update',
+             '__delitem__', '__iadd__', '__iand__', '__imul__', '__ior__', '__isub__', '__ixor__', '__setitem__')
 
 
 class AbstractAttribute(object):
@@ -77,6 +81,7 @@ class DirectAttribute(AbstractAttribute):
     def __get__(self, obj, cls):
         if not hasattr(obj, self.object_attribute):
             setattr(obj, self.object_attribute, self.type())
+            obj._changed()
 
         return getattr(obj, self.object_attribute)
 
@@ -86,10 +91,41 @@ class DirectAttribute(AbstractAttribute):
     def __set__(self, obj, value):
         if type(value) == str:
             value = self.from_string(value)
-        return setattr(obj, self.object_attribute, value)
+        setattr(obj, self.object_attribute, value)
+        obj._changed()
+        return value
 
     def __delete__(self, obj):
         delattr(obj, self.object_attribute)
+        obj._changed()
+
+
+def tracked(collection_type):
+    '''Returns a subclass of the given collection type that notifies its owning Blok of every modification'''
+    def notify(method):
+        def modify(self, *args, **kwargs):
+            result = method(self, *args, **kwargs)
+            if self.owner is not None:
+                self.owner._changed()
+            return result
+        modify.__name__ = method.__name__
+        modify.__doc__ = method.__doc__
+        return modify
+
+    def __init__(self, values=(), owner=None):
+        collection_type.__init__(self, values)
+        self.owner = owner
+
+    class_dict = {'__slots__': ('owner', ), '__init__': __init__}
+    for method_name in MODIFIERS:
+        if hasattr(collection_type, method_name):
+            class_dict[method_name] = notify(getattr(collection_type, method_name))
+    return type('Tracked' + collection_type.__name__.title(), (collection_type, ), class_dict)
+
+
+TrackedList = tracked(list)
+TrackedSet = tracked(set)
+TrackedDict = tracked(dict)
 
 
 class RenderedDirect(DirectAttribute):
@@ -107,18 +143,32 @@ class RenderedDirect(DirectAttribute):
         if hasattr(obj, self.object_attribute):
             value = self.render_value(obj)
             if not self.safe:
-                value = cgi.escape(value)
+                value = escape_attribute(value)
             return '{0}="{1}"'.format(self.name, value)
 
 
 class ListAttribute(RenderedDirect):
     '''Defines an attribute that is exposed from Python as a list'''
     __slots__ = ()
-    list_type = list
+    list_type = TrackedList
 
     def __init__(self, signal=False, doc="Takes a list of values", name=None):
         super().__init__(signal=signal, type=self.list_type, doc=doc, name=name)
 
+    def __get__(self, obj, cls):
+        if not hasattr(obj, self.object_attribute):
+            setattr(obj, self.object_attribute, self.type(owner=obj))
+            obj._changed()
+
+        return getattr(obj, self.object_attribute)
+
+    def __set__(self, obj, value):
+        if type(value) == str:
+            value = self.from_string(value)
+        if not isinstance(value, self.type) or value.owner is not obj:
+            value = self.type(value, owner=obj)
+        return super().__set__(obj, value)
+
     def render_value(self, obj):
         return " ".join(str(value) for value in getattr(obj, self.object_attribute))
 
@@ -129,7 +179,7 @@ class ListAttribute(RenderedDirect):
 class SetAttribute(ListAttribute):
     '''Defines an attribute that is exposed from Python as a set'''
     __slots__ = ()
-    list_type = set
+    list_type = TrackedSet
 
 
 class BlokAttribute(DirectAttribute):
@@ -212,6 +262,32 @@ class AccessorAttribute(DirectAttribute):
             delattr(obj, self.object_attribute)
 
 
+class LazyAccessorAttribute(AccessorAttribute):
+    '''Defines a blok accessed by a root attribute, that gets built by its (lazy) parent the first time it is
+       accessed
+    '''
+    __slots__ = ()
+
+    def built(self, obj):
+        built = None
+        while not hasattr(obj, self.object_attribute):
+            parent = getattr(obj, self.parent_attribute, None)
+            if parent is None or parent is built:
+                break
+            built = parent
+            parent.blox
+        return obj
+
+    def __get__(self, obj, cls):
+        return super().__get__(self.built(obj), cls)
+
+    def __set__(self, obj, value):
+        return super().__set__(self.built(obj), value)
+
+    def __delete__(self, obj):
+        return super().__delete__(self.built(obj))
+
+
 class TextAttribute(BlokAttribute):
     __slots__ = ()
 
@@ -231,7 +307,7 @@ class TextAttribute(BlokAttribute):
         self.__delete__(obj)
         if not hasattr(obj, self.object_attribute):
             position = getattr(self, 'position', None)
-            value = self.type(value)
+            value = value if isinstance(value, self.type) else self.type(value)
             if position is not None:
                 obj.blox.insert(position, value)
             else:
@@ -241,19 +317,47 @@ class TextAttribute(BlokAttribute):
 
 
 class Attribute(AbstractAttribute):
-    '''Defines a basic Blok attribute that is rendered by the framework and stores its data in a .attributes dict'''
-    __slots__ = ()
+    '''Defines a basic Blok attribute that is rendered by the framework and stores its data in the Blok's compact
+       _values list, at the value_index given to it by TagAttributes (or keyed by it in a _values dict, for
+       tag classes with sparse_values)
+    '''
+    __slots__ = ('value_index', )
+
+    def value(self, obj):
+        '''Returns the value stored for obj, or None if it hasn't been set'''
+        values = getattr(obj, '_values', ())
+        if type(values) == dict:
+            return values.get(self.value_index)
+        return values[self.value_index] if self.value_index < len(values) else None
 
     def __get__(self, obj, cls):
-        return obj.attributes[self.name]
+        if obj is None:
+            return self
+
+        value = self.value(obj)
+        if value is None:
+            raise KeyError(self.name)
+        return value
 
     def __set__(self, obj, value):
-        if self.signal and (self.name not in obj.attributes or obj.attributes[self.name] != value):
+        if self.signal and self.value(obj) != value:
             obj.emit(self.signal, value)
-        obj.attributes[self.name] = value
+        values = getattr(obj, '_values', ())
+        if obj.sparse_values:
+            if not values:
+                values = obj._values = {}
+        elif self.value_index >= len(values):
+            values = obj._values = list(values) + [None] * (self.value_index + 1 - len(values))
+        values[self.value_index] = value
+        obj._changed()
 
     def __delete__(self, obj):
-        obj.attributes.pop(self.name, None)
+        values = getattr(obj, '_values', ())
+        if type(values) == dict:
+            values.pop(self.value_index, None)
+        elif self.value_index < len(values):
+            values[self.value_index] = None
+        obj._changed()
 
 
 class AttributeTransform(Attribute):
@@ -266,6 +370,9 @@ class AttributeTransform(Attribute):
         self.to_html = to_html
 
     def __get__(self, obj, cls):
+        if obj is None:
+            return self
+
         value = super().__get__(obj, cls)
         return self.to_python(value) if self.to_python else value
 
@@ -19,19 +19,130 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 OTHER DEALINGS IN THE SOFTWARE.
 
 '''
-from collections import OrderedDict
+from collections import OrderedDict, deque
 import re
+import sys
+import threading
+from contextlib import contextmanager
 from itertools import chain
 
 from connectable import Connectable
 from connectable.base import CombineSignals
-from blox.attributes import (AbstractAttribute, Attribute, RenderedDirect, SetAttribute,
+from blox import cache
+from blox.index import Index
+from blox.selectors import compiled
+from blox.escaping import escape_attribute
+from blox.attributes import (AbstractAttribute, Attribute, RenderedDirect, ListAttribute, SetAttribute,
                              BooleanAttribute, IntegerAttribute, DirectAttribute, BlokAttribute,
-                             AccessorAttribute, NestedBlokAttribute)
+                             AccessorAttribute, NestedBlokAttribute, TrackedDict, TrackedList, TrackedSet)
 
 from io import StringIO
 
 UNDERSCORE = (re.compile('(.)([A-Z][a-z]+)'), re.compile('([a-z0-9])([A-Z])'))
+CHUNK_SIZE = 8192
+DRAIN_SIZE = 65536
+NOT_CLONED = ('connections', '_parent', '_blox', '_observed', '_version', '_frozen', '_render_cache', '_index',
+              '__weakref__')
+UNCOPIED = (str, int, float, bool, type(None))
+MISSING = object()
+SPARSE_VALUES_SIZE = sys.getsizeof({0: None})
+batching = threading.local()
+START_TAG_TEMPLATE = """def render_start_tag(self):
+{indent}rendered = []
+{indent}{render_steps}
+{indent}values = getattr(self, '_values', None)
+{indent}if values:
+{indent}{indent}for name, value in {value_items}:
+{indent}{indent}{indent}if value:
+{indent}{indent}{indent}{indent}rendered.append(name + '="' + str(value) + '"')
+{indent}attributes = getattr(self, '_attributes', None)
+{indent}if attributes:
+{indent}{indent}for name, value in attributes.items():
+{indent}{indent}{indent}if value:
+{indent}{indent}{indent}{indent}rendered.append(name + '="' + str(value) + '"')
+{indent}if rendered:
+{indent}{indent}return {open_tag} + ' ' + ' '.join(rendered) + {close_tag}
+{indent}return {open_tag} + {close_tag}
+"""
+
+
+def chunked(steps, render_to, chunk_size=CHUNK_SIZE):
+    '''Yields everything written to render_to while stepping through a stream, coalesced into chunk_size pieces'''
+    for _ in steps:
+        if render_to.tell() >= chunk_size:
+            yield render_to.getvalue()
+            render_to.seek(0)
+            render_to.truncate()
+    if render_to.tell():
+        yield render_to.getvalue()
+
+
+class Encoder(object):
+    '''Adapts a bytearray to the write(str) output protocol, appending each str utf8 encoded'''
+    __slots__ = ('buffer', )
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def write(self, text):
+        self.buffer += text.encode('utf8')
+
+
+def render_bytes(blox, buffer=None, *args, **kwargs):
+    '''Renders blox into buffer (a new bytearray if not given) as utf8, returning a memoryview of the result'''
+    if buffer is None:
+        buffer = bytearray()
+    else:
+        try:
+            del buffer[:]
+        except BufferError:
+            raise BufferError('Can not reuse a buffer while the memoryview last rendered into it is still referenced: '
+                              'release() that view, or use it as a context manager, before rendering again')
+    blox.output_bytes(buffer, *args, **kwargs)
+    return memoryview(buffer)
+
+
+async def drained(chunks, writer, drain_at=DRAIN_SIZE, encoding='utf8'):
+    '''Writes str chunks to an asyncio StreamWriter like object, awaiting drain() every drain_at bytes'''
+    pending = 0
+    for chunk in chunks:
+        data = chunk.encode(encoding)
+        writer.write(data)
+        pending += len(data)
+        if pending >= drain_at:
+            await writer.drain()
+            pending = 0
+    await writer.drain()
+
+
+@contextmanager
+def batch(notify=None):
+    '''Holds back the signals emitted by bloks while inside, then emits each blok's signals just once at the end,
+       with the latest value emitted, no matter how many times they changed
+
+       If notify is given, it replaces emitting them: it is called once per signal, with the signal and an OrderedDict
+       of every blok that emitted it mapped to the latest value it emitted
+    '''
+    outer = (getattr(batching, 'pending', None), getattr(batching, 'notify', None))
+    if outer[0] is not None and notify is None:
+        yield
+        return
+
+    pending = OrderedDict()
+    batching.pending, batching.notify = pending, notify
+    try:
+        yield
+    finally:
+        batching.pending, batching.notify = outer
+        if notify is None:
+            for (blok, signal), value in pending.items():
+                blok.emit(signal, value)
+        else:
+            changes = OrderedDict()
+            for (blok, signal), value in pending.items():
+                changes.setdefault(signal, OrderedDict())[blok] = value
+            for signal, changed in changes.items():
+                notify(signal, changed)
 
 
 class Blox(list):
@@ -46,8 +157,9 @@ class Blox(list):
         if type(index) in (int, slice):
             return super().__setitem__(index, value)
 
-        for blok in self:
-            blok[index] = value
+        with batch():
+            for blok in self:
+                blok[index] = value
 
     def get(self, index, default=None):
         if type(index) in (int, slice):
@@ -61,12 +173,40 @@ class Blox(list):
             blok.output(to, *args, **kwargs)
         return self
 
+    def stream(self, to=None, *args, **kwargs):
+        '''Outputs to a stream one blok at a time, yielding whenever what has been written so far can be sent'''
+        for blok in self:
+            yield from blok.stream(to, *args, **kwargs)
+
+    def output_bytes(self, buffer, *args, **kwargs):
+        '''Outputs utf8 encoded to the end of a bytearray'''
+        for blok in self:
+            blok.output_bytes(buffer, *args, **kwargs)
+        return self
+
+    def render_bytes(self, buffer=None, *args, **kwargs):
+        '''Renders as utf8 encoded bytes, returning a memoryview of buffer (a new bytearray if none is given)
+           NOTE: buffer is cleared first, so the same bytearray can be reused for every response, as long as the
+                 memoryview returned for the previous response has been released
+        '''
+        return render_bytes(self, buffer, *args, **kwargs)
+
     def render(self, *args, **kwargs):
         '''Renders as a str'''
         render_to = StringIO()
         self.output(render_to, *args, **kwargs)
         return render_to.getvalue()
 
+    def iter_render(self, chunk_size=CHUNK_SIZE, *args, **kwargs):
+        '''Renders as an iterable of str chunks (like a WSGI response body)'''
+        render_to = StringIO()
+        return chunked(self.stream(render_to, *args, **kwargs), render_to, chunk_size)
+
+    async def aoutput(self, writer, drain_at=DRAIN_SIZE, encoding='utf8', chunk_size=CHUNK_SIZE, **kwargs):
+        '''Outputs to an asyncio StreamWriter like object, awaiting its drain() every drain_at bytes'''
+        await drained(self.iter_render(chunk_size, **kwargs), writer, drain_at, encoding)
+        return self
+
     def __str__(self):
         return self.render(formatted=True)
 
@@ -74,8 +214,9 @@ class Blox(list):
         return self and getattr(self[0], attribute, None)
 
     def __setattr__(self, attribute, value):
-        for blok in self:
-            setattr(self, attribute, value)
+        with batch():
+            for blok in self:
+                setattr(blok, attribute, value)
 
     def first(self):
         return self.__class__((self[:1], ))
@@ -90,19 +231,61 @@ class Blox(list):
         return self
 
     def add_class(self, class_name):
-        for blok in self:
-            if hasattr(blok, 'classes'):
-                blok.classes.add(class_name)
-        return self
+        return self.add_classes(class_name)
 
     def remove_class(self, class_name):
-        for blok in self:
-            if hasattr(blok, 'classes'):
-                blok.classes.discard(class_name)
+        return self.remove_classes(class_name)
+
+    def add_classes(self, *class_names):
+        '''Adds all the given classes to every blok, changing each blok once'''
+        with batch():
+            for blok in self:
+                if hasattr(blok, 'classes'):
+                    blok.classes.update(class_names)
+        return self
+
+    def remove_classes(self, *class_names):
+        '''Removes all the given classes from every blok, changing each blok once'''
+        with batch():
+            for blok in self:
+                if hasattr(blok, 'classes'):
+                    blok.classes.difference_update(class_names)
+        return self
+
+    def set(self, **attributes):
+        '''Sets the given attributes on every blok, emitting their signals once at the end'''
+        with batch():
+            for blok in self:
+                for attribute, value in attributes.items():
+                    blok[attribute] = value
+        return self
+
+    def update_text(self, values):
+        '''Updates the text of every blok to the value at the same position in values,
+           emitting their signals once at the end
+        '''
+        from blox.text import Text
+
+        with batch():
+            for blok, value in zip(self, values):
+                if isinstance(blok, Text):
+                    blok.value = value
+                elif 'text' in getattr(blok, 'attribute_descriptors', ()):
+                    blok.text = value
+                elif len(blok) == 1 and isinstance(blok[0], Text):
+                    blok[0].value = value
+                else:
+                    blok.blox[:] = [Text(value)]
         return self
 
+    def batch(self, notify=None):
+        '''Returns a context within which the signals of changed bloks are emitted once, at the end,
+           or given to notify once per signal (see batch)
+        '''
+        return batch(notify)
+
     def filter(self, **attributes):
-        return self.__class__((blok for blok in self if self._matches(blok, **attributes)))
+        return Blox((blok for blok in self if self._matches(blok, **attributes)))
 
     def _matches(self, blok, **attributes):
         for attribute, expected_value in attributes.items():
@@ -118,17 +301,263 @@ class Blox(list):
         return True
 
     def walk(self):
-        for blok in self:
-            yield blok
-            if hasattr(blok, '_blox'):
-                for item in blok.blox.walk():
-                    yield item
+        '''Yields every blok within and below, building any lazily built children on the way'''
+        stack = [iter(self)]
+        while stack:
+            for blok in stack[-1]:
+                yield blok
+                if hasattr(blok, '_blox') or getattr(blok, 'builds_lazily', False):
+                    stack.append(iter(blok.blox))
+                    break
+            else:
+                stack.pop()
 
     def all(self):
-        return self.__class__(self.walk())
+        return Blox(self.walk())
 
     def query(self, **attributes):
-        return self.__class__((blok for blok in self.walk() if self._matches(blok, **attributes)))
+        index = self._indexed()
+        candidates = index.candidates(**attributes) if index is not None else None
+        if candidates is None:
+            return Blox((blok for blok in self.walk() if self._matches(blok, **attributes)))
+
+        within = self._within(index)
+        return self._ordered(index, ((within(blok), blok) for blok in candidates
+                                     if self._matches(blok, **attributes)))
+
+    def select(self, css):
+        '''Returns every blok within, or below, matching the given CSS selector
+           (supporting tags, #ids, .classes, [attributes] and descendant or child combinators)
+        '''
+        selectors = compiled(css)
+        index = self._indexed()
+        if index is None or any(selector.key is None for selector in selectors):
+            return Blox((blok for blok in self.walk() if any(selector(blok) for selector in selectors)))
+
+        within = self._within(index)
+        found = OrderedDict()
+        for selector in selectors:
+            for blok in index.find(*selector.key):
+                if selector(blok):
+                    found[blok] = None
+        return self._ordered(index, ((within(blok), blok) for blok in found))
+
+    def _indexed(self):
+        '''Returns the Index that covers every blok within, if there is one'''
+        index = getattr(self[0], '_index', None) if self else None
+        if index is not None and all(getattr(blok, '_index', None) is index for blok in self[1:]):
+            return index
+
+    def _within(self, index):
+        '''Returns a function that gives the position of the blok within that a blok is, or is below,
+           or None if it is not below any of them
+        '''
+        if len(self) == 1 and self[0] is index.root:
+            return lambda blok: 0
+
+        roots = {id(blok): position for position, blok in enumerate(self)}
+
+        def within(blok):
+            while blok is not None:
+                position = roots.get(id(blok))
+                if position is not None:
+                    return position
+                blok = getattr(blok, '_parent', None)
+        return within
+
+    @staticmethod
+    def _ordered(index, found):
+        '''Returns the bloks of (position within, blok) pairs, found through index, in the order walking would yield
+           them: no matter in what order they were indexed
+        '''
+        found = [(within, blok) for within, blok in found if within is not None]
+        if len(found) > 1:
+            found.sort(key=lambda item: (item[0], index.path(item[1])))
+        return Blox(blok for within, blok in found)
+
+    def freeze(self):
+        '''Freezes every Container within, see Container.freeze'''
+        for blok in self:
+            if hasattr(blok, 'freeze'):
+                blok.freeze()
+        return self
+
+    def thaw(self):
+        '''Thaws every Container within, see Container.thaw'''
+        for blok in self:
+            if hasattr(blok, 'thaw'):
+                blok.thaw()
+        return self
+
+
+class Children(Blox):
+    '''The child blox of a Container: keeps each child's parent current and notifies the Container of changes'''
+    __slots__ = ('owner', )
+
+    def __init__(self, owner, blox=()):
+        list.__init__(self, blox)
+        object.__setattr__(self, 'owner', owner)
+
+    def _adopt(self, blok):
+        if isinstance(blok, Blok):
+            blok._parent = self.owner
+            index = getattr(self.owner, '_index', None)
+            if index is not None:
+                index.add(blok)
+        return blok
+
+    def _release(self, blok):
+        if isinstance(blok, Blok) and getattr(blok, '_parent', None) is self.owner:
+            blok._parent = None
+            index = getattr(blok, '_index', None)
+            if index is not None:
+                index.discard(blok)
+        return blok
+
+    def _indexed(self):
+        return getattr(self.owner, '_index', None)
+
+    def _placed(self, start, stop=None):
+        '''Positions the bloks added from start up to stop (or just the one at start) within the index, if any'''
+        index = getattr(self.owner, '_index', None)
+        if index is not None:
+            index.place(self, start, start + 1 if stop is None else stop)
+
+    def _renumbered(self):
+        '''Positions all the bloks within the index again, if any, after they were reordered'''
+        index = getattr(self.owner, '_index', None)
+        if index is not None:
+            index.renumber(self)
+
+    def _within(self, index):
+        owner = self.owner
+        if owner is index.root:
+            return lambda blok: None if blok is owner else 0
+
+        def within(blok):
+            parent = getattr(blok, '_parent', None)
+            while parent is not None:
+                if parent is owner:
+                    return 0
+                parent = getattr(parent, '_parent', None)
+        return within
+
+    def _changed(self):
+        if getattr(self.owner, '_observed', False):
+            self.owner._invalidate()
+
+    def append(self, blok):
+        if isinstance(blok, Blok):
+            blok._parent = self.owner
+            if getattr(self.owner, '_index', None) is not None:
+                self.owner._index.add(blok)
+        list.append(self, blok)
+        self._placed(len(self) - 1)
+        self._changed()
+
+    def insert(self, index, blok):
+        size = len(self)
+        index = min(max(index + size if index < 0 else index, 0), size)
+        super().insert(index, self._adopt(blok))
+        self._placed(index)
+        self._changed()
+
+    def extend(self, blox):
+        start = len(self)
+        super().extend(self._adopt(blok) for blok in blox)
+        self._placed(start, len(self))
+        self._changed()
+
+    def __iadd__(self, blox):
+        self.extend(blox)
+        return self
+
+    def remove(self, blok):
+        super().remove(blok)
+        self._release(blok)
+        self._changed()
+
+    def pop(self, index=-1):
+        blok = self._release(super().pop(index))
+        self._changed()
+        return blok
+
+    def clear(self):
+        for blok in self:
+            self._release(blok)
+        super().clear()
+        self._changed()
+
+    def __setitem__(self, index, value):
+        if type(index) == int:
+            self._release(self[index])
+            self._adopt(value)
+        elif type(index) == slice:
+            for blok in self[index]:
+                self._release(blok)
+            value = [self._adopt(blok) for blok in value]
+        else:
+            return super().__setitem__(index, value)
+
+        super().__setitem__(index, value)
+        if type(index) == int:
+            self._placed(index + len(self) if index < 0 else index)
+        else:
+            self._renumbered()
+        self._changed()
+
+    def __delitem__(self, index):
+        for blok in (self[index] if type(index) == slice else (self[index], )):
+            self._release(blok)
+        super().__delitem__(index)
+        self._changed()
+
+    def reverse(self):
+        super().reverse()
+        self._renumbered()
+        self._changed()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._renumbered()
+        self._changed()
+
+
+def _compile_start_tag(tag_class, indent='    '):
+    '''Returns a render_start_tag function specialized to the tag name and rendered attributes of a tag class'''
+    name_space = {'escape_attribute': escape_attribute, 'missing': MISSING, 'value_names': tag_class.value_names}
+    lines = []
+    for index, attribute in enumerate(tag_class.render_attributes):
+        attribute_name = 'attribute_{0}'.format(index)
+        name_space[attribute_name] = attribute
+        if type(attribute).render is not RenderedDirect.render:
+            lines.append('value = {0}.render(self)'.format(attribute_name))
+            lines.append('if value:')
+            lines.append('{indent}rendered.append(value)')
+            continue
+
+        render_value = type(attribute).render_value
+        if render_value is RenderedDirect.render_value:
+            value = 'str(value)'
+        elif render_value is ListAttribute.render_value:
+            value = '" ".join(str(item) for item in value)'
+        else:
+            value = '{0}.render_value(self)'.format(attribute_name)
+        if not attribute.safe:
+            value = 'escape_attribute({0})'.format(value)
+        lines.append('value = getattr(self, "{0}", missing)'.format(attribute.object_attribute))
+        lines.append('if value is not missing:')
+        lines.append('{{indent}}rendered.append({0} + {1} + \'"\')'.format(repr(attribute.name + '="'), value))
+
+    tag = getattr(tag_class, 'tag', '')
+    open_tag = repr('<' + tag) if isinstance(tag, str) else "'<' + self.tag"
+    close_tag = repr(' />' if tag_class.tag_self_closes else '>')
+    value_items = ('((value_names[index], value) for index, value in sorted(values.items()))'
+                   if tag_class.sparse_values else 'zip(value_names, values)')
+    code = START_TAG_TEMPLATE.format(render_steps="\n{indent}".join(lines).replace("{indent}", indent),
+                                     value_items=value_items, open_tag=open_tag, close_tag=close_tag, indent=indent)
+    exec(compile(code, '<{0}.render_start_tag>'.format(tag_class.__name__), 'exec'), name_space)
+    return name_space['render_start_tag']
 
 
 class TagAttributes(CombineSignals):
@@ -173,10 +602,24 @@ class TagAttributes(CombineSignals):
                 class_dict['__slots__'] += tuple(attribute.object_attribute for attribute in direct_attributes)
                 class_dict['__slots__'] += tuple(attribute.parent_attribute for attribute in accessor_attributes)
 
+            value_count = getattr(parents[0], 'value_count', 0)
+            for attribute in attributes.values():
+                if isinstance(attribute, Attribute):
+                    if not hasattr(attribute, 'value_index'):
+                        attribute.value_index = value_count
+                    value_count = max(value_count, attribute.value_index + 1)
+            value_names = [None] * value_count
+            for attribute in attributes.values():
+                if isinstance(attribute, Attribute):
+                    value_names[attribute.value_index] = attribute.name
+            class_dict['value_count'] = value_count
+            class_dict['value_names'] = tuple(value_names)
+            class_dict['sparse_values'] = sys.getsizeof(value_names) > SPARSE_VALUES_SIZE
+
             if render_attributes:
                 if hasattr(parents[0], 'render_attributes'):
                     render_attributes = list(parents[0].render_attributes) + render_attributes
-                class_dict['render_attributes'] = set(render_attributes)
+                class_dict['render_attributes'] = tuple(OrderedDict.fromkeys(render_attributes))
 
             if init_attributes:
                 if hasattr(parents[0], 'init_attributes'):
@@ -203,27 +646,274 @@ class TagAttributes(CombineSignals):
             if attribute_signals:
                 class_dict['signals'] = class_dict.get('signals', ()) + tuple(attribute_signals)
 
-        return super(TagAttributes, metaclass).__new__(metaclass, name, parents, class_dict, *kargs, **kwargs)
+        blok = super(TagAttributes, metaclass).__new__(metaclass, name, parents, class_dict, *kargs, **kwargs)
+        if hasattr(blok, 'render_start_tag') and not 'render_start_tag' in class_dict:
+            blok.render_start_tag = _compile_start_tag(blok)
+            if not 'end_tag' in class_dict:
+                blok.end_tag = blok.render_end_tag(blok) if isinstance(blok.tag, str) else property(blok.render_end_tag)
+            if not 'end_tag_bytes' in class_dict:
+                blok.end_tag_bytes = (blok.end_tag.encode('utf8') if isinstance(blok.end_tag, str) else
+                                      property(blok.render_end_tag_bytes))
+        blok.cloned_slots = _cloned_slots(blok)
+        return blok
+
+
+def _cloned_slots(blok):
+    cloned_slots = []
+    for parent in reversed(blok.__mro__):
+        slots = parent.__dict__.get('__slots__', ())
+        for name in ((slots, ) if isinstance(slots, str) else slots):
+            if name not in NOT_CLONED and name not in cloned_slots:
+                cloned_slots.append(name)
+    return tuple(cloned_slots)
+
+
+def clone(blok):
+    '''Returns a structural copy of a blok and everything below it, without re-running any of their construction'''
+    originals = [blok]
+    clones = {id(blok): blok.__class__.__new__(blok.__class__)}
+    for original in originals:
+        children = getattr(original, '_blox', None)
+        if children is not None:
+            copy = clones[id(original)]
+            copied_children = []
+            for child in children:
+                if isinstance(child, Blok):
+                    originals.append(child)
+                    clones[id(child)] = child = child.__class__.__new__(child.__class__)
+                    child._parent = copy
+                copied_children.append(child)
+            copy._blox = Children(copy, copied_children)
+
+    def copied(value):
+        if isinstance(value, Blok):
+            return clones.get(id(value), value)
+        elif type(value) in (TrackedDict, TrackedList, TrackedSet):
+            return type(value)(value, owner=copied(value.owner))
+        elif type(value) == Blox:
+            return Blox(copied(item) for item in value)
+        elif type(value) in (dict, list):
+            return type(value)(value)
+        return value
+
+    for original in originals:
+        copy = clones[id(original)]
+        for name in original.cloned_slots:
+            value = getattr(original, name, MISSING)
+            if value is not MISSING:
+                setattr(copy, name, value if type(value) in UNCOPIED else copied(value))
+        if hasattr(original, '__dict__'):
+            copy.__dict__.update((name, copied(value)) for name, value in original.__dict__.items())
+
+    return clones[id(blok)]
+
+
+def _output(root, to, formatted=False, indent=0, indentation='  ', *args, **kwargs):
+    '''Outputs a Container using an explicit stack, instead of recursing, into every nested Container that outputs
+       itself the standard way - so that even deeply nested blox output quickly and within the recursion limit
+    '''
+    if formatted:
+        deque(_formatted_steps(root, to, indent, indentation, *args, **kwargs), maxlen=0)
+    else:
+        deque(_steps(root, to, *args, **kwargs), maxlen=0)
+
+
+def _steps(root, to, *args, **kwargs):
+    '''Outputs a Container, yielding after every blok that outputs itself in some other way,
+       so that what has been written so far can be sent while streaming
+    '''
+    write = to.write
+    stack = [_opened(root, write)]
+    while stack:
+        for blok in stack[-1][0]:
+            output = type(blok).output
+            if output is TAG_OUTPUT and getattr(blok, '_frozen', None) is None and \
+                    getattr(blok, '_render_cache', None) is None:
+                write(blok.start_tag)
+                stack.append((iter(() if blok.tag_self_closes else getattr(blok, '_blox', ())), blok.end_tag))
+                break
+            elif output is CONTAINER_OUTPUT and getattr(blok, '_frozen', None) is None and \
+                    getattr(blok, '_render_cache', None) is None:
+                stack.append((iter(getattr(blok, '_blox', ())), ''))
+                break
+            blok.output(to=to, *args, **kwargs)
+            yield
+        else:
+            write(stack.pop()[1])
+
+
+def _formatted_steps(root, to, indent=0, indentation='  ', *args, **kwargs):
+    '''Outputs a Container formatted using an explicit stack,
+       yielding after every blok that outputs itself in some other way
+    '''
+    write = to.write
+    stack = [_opened(root, write, True, indent)]
+    while stack:
+        frame = stack[-1]
+        children, end_tag, indent = frame[0], frame[1], frame[2]
+        for blok in children:
+            if end_tag is not None:
+                write(indentation * (indent + 1))
+                child_indent = indent + 1
+            else:
+                if frame[3]:
+                    write('\n')
+                    write(indent * indentation)
+                frame[3] = True
+                child_indent = indent
+
+            if (type(blok).output in (TAG_OUTPUT, CONTAINER_OUTPUT) and getattr(blok, '_frozen', None) is None and
+                    getattr(blok, '_render_cache', None) is None):
+                stack.append(_opened(blok, write, True, child_indent))
+                break
+            blok.output(to=to, formatted=True, indent=child_indent, indentation=indentation, *args, **kwargs)
+            if end_tag is not None:
+                write('\n')
+            yield
+        else:
+            stack.pop()
+            if end_tag is not None:
+                write(indentation * indent)
+                write(end_tag)
+                if not indentation:
+                    write('\n')
+            elif frame[3] and not indent:
+                write('\n')
+            if stack and stack[-1][1] is not None:
+                write('\n')
+
+
+def _output_bytes(root, buffer, *args, **kwargs):
+    '''Outputs a Container utf8 encoded to the end of a bytearray using an explicit stack, like _output,
+       into every nested Container that outputs itself the standard way both as bytes and as str
+    '''
+    if isinstance(root, AbstractTag):
+        buffer += root.start_tag_bytes
+        stack = [(iter(() if root.tag_self_closes else root.blox), root.end_tag_bytes)]
+    else:
+        stack = [(iter(root.blox), b'')]
+    while stack:
+        for blok in stack[-1][0]:
+            if type(blok).output_bytes is CONTAINER_OUTPUT_BYTES and type(blok).output in STANDARD_OUTPUTS and \
+                    getattr(blok, '_frozen', None) is None and getattr(blok, '_render_cache', None) is None:
+                if isinstance(blok, AbstractTag):
+                    buffer += blok.start_tag_bytes
+                    stack.append((iter(() if blok.tag_self_closes else getattr(blok, '_blox', ())),
+                                  blok.end_tag_bytes))
+                else:
+                    stack.append((iter(getattr(blok, '_blox', ())), b''))
+                break
+            blok.output_bytes(buffer, *args, **kwargs)
+        else:
+            buffer += stack.pop()[1]
+
+
+def _opened(blok, write, formatted=False, indent=0):
+    '''Writes the start of a Container being output, returning what is needed to output the rest of it:
+       an iterator of its children, its end tag (None if it isn't a tag), its indent and whether a child was output
+    '''
+    if isinstance(blok, AbstractTag):
+        write(blok.start_tag)
+        if formatted:
+            write('\n')
+        return [iter(() if blok.tag_self_closes else blok.blox), blok.end_tag, indent, False]
+    return [iter(blok.blox), None if formatted else '', indent, False]
+
+
+def observe(blok):
+    '''Marks a blok and everything below it as included in output rendered ahead of time'''
+    stack = [blok]
+    while stack:
+        blok = stack.pop()
+        if isinstance(blok, Blok) and not getattr(blok, '_observed', False):
+            blok._observed = True
+            stack.extend(getattr(blok, '_blox', ()))
 
 
 class Blok(Connectable, metaclass=TagAttributes):
     '''Defines the base blox blok object which can render itself and be instanciated'''
-    __slots__ = ()
+    __slots__ = ('_parent', '_observed', '_version', '_index')
 
     def output(self, to=None, *args, **kwargs):
         '''Outputs to a stream (like a file or request)'''
         to.write('')
         return self
 
+    def stream(self, to=None, *args, **kwargs):
+        '''Outputs to a stream in steps, yielding whenever what has been written so far can be sent'''
+        self.output(to, *args, **kwargs)
+        yield
+
+    def output_bytes(self, buffer, *args, **kwargs):
+        '''Outputs utf8 encoded to the end of a bytearray'''
+        self.output(Encoder(buffer), *args, **kwargs)
+        return self
+
+    def render_bytes(self, buffer=None, *args, **kwargs):
+        '''Renders as utf8 encoded bytes, returning a memoryview of buffer (a new bytearray if none is given)
+           NOTE: buffer is cleared first, so the same bytearray can be reused for every response, as long as the
+                 memoryview returned for the previous response has been released
+        '''
+        return render_bytes(self, buffer, *args, **kwargs)
+
     def render(self, *args, **kwargs):
         '''Renders as a str'''
         render_to = StringIO()
         self.output(render_to, *args, **kwargs)
         return render_to.getvalue()
 
+    def iter_render(self, chunk_size=CHUNK_SIZE, *args, **kwargs):
+        '''Renders as an iterable of str chunks (like a WSGI response body)'''
+        render_to = StringIO()
+        return chunked(self.stream(render_to, *args, **kwargs), render_to, chunk_size)
+
+    async def aoutput(self, writer, drain_at=DRAIN_SIZE, encoding='utf8', chunk_size=CHUNK_SIZE, **kwargs):
+        '''Outputs to an asyncio StreamWriter like object, awaiting its drain() every drain_at bytes'''
+        await drained(self.iter_render(chunk_size, **kwargs), writer, drain_at, encoding)
+        return self
+
     def __str__(self):
         return self.render(formatted=True)
 
+    def clone(self):
+        '''Returns a copy of this Blok, and everything below it, that can be changed independently'''
+        return clone(self)
+
+    def emit(self, signal, value=None, gather=False):
+        pending = getattr(batching, 'pending', None)
+        if pending is None or gather:
+            return super().emit(signal, value, gather)
+
+        if batching.notify is not None or signal in getattr(self, 'connections', ()):
+            pending[(self, signal)] = value
+        return True
+
+    def _changed(self):
+        '''Called whenever something that affects how this Blok renders is modified'''
+        self._invalidate()
+        index = getattr(self, '_index', None)
+        if index is not None:
+            index.update(self)
+
+    @property
+    def version(self):
+        '''Returns a number that increases whenever this Blok, or anything below it, changes after being rendered
+           ahead of time (by freeze or cache)
+        '''
+        return getattr(self, '_version', 0)
+
+    def _invalidate(self):
+        '''Drops anything rendered ahead of time that includes this Blok, from it up through its parents'''
+        blok = self
+        while blok is not None:
+            if getattr(blok, '_frozen', None) is not None:
+                blok._frozen = None
+            if not getattr(blok, '_observed', False):
+                break
+            blok._observed = False
+            blok._version = blok.version + 1
+            blok = getattr(blok, '_parent', None)
+
     def __repr_self__(self, identifiers=()):
         return "{0}({1})".format(self.__class__.__name__, " ".join(identifiers))
 
@@ -242,7 +932,7 @@ class Invalid(Blok):
 
 class Container(Blok):
     '''A Block that can contain child blocks'''
-    __slots__ = ('_blox', )
+    __slots__ = ('_blox', '_frozen', '_render_cache', '__weakref__')
 
     def __init__(self, *blox):
         super().__init__()
@@ -261,9 +951,83 @@ class Container(Blok):
     def blox(self):
         '''Lazily creates and returns the list of child blox'''
         if not hasattr(self, '_blox'):
-            self._blox = Blox()
+            self._blox = Children(self)
         return self._blox
 
+    def freeze(self):
+        '''Stores this Container's rendered output, reusing it until the Container or any of its children change'''
+        self._frozen = None
+        self._frozen = {None: self.render()}
+        observe(self)
+        return self
+
+    def thaw(self):
+        '''Drops the output stored by freeze, so this Container renders itself again'''
+        self._frozen = None
+        return self
+
+    def index(self, *attributes):
+        '''Indexes every blok below this Container by id, classes, tag and any of the given attributes,
+           keeping the index current as they change so that queries including this Container don't walk the tree
+           NOTE: does nothing if this Container is already part of an index
+        '''
+        if getattr(self, '_index', None) is None:
+            Index(self, attributes)
+        return self
+
+    def select(self, css):
+        '''Returns this Container, and every blok below it, matching the given CSS selector (see Blox.select)'''
+        return Blox((self, )).select(css)
+
+    def unindex(self):
+        '''Drops the index created by calling index on this Container'''
+        index = getattr(self, '_index', None)
+        if index is not None and index.root is self:
+            index.discard(self)
+        return self
+
+    def cache(self, render_cache=None):
+        '''Reuses this Container's rendered output, stored in render_cache (blox.cache.renders by default),
+           for as long as the Container and its children stay unchanged
+        '''
+        self._render_cache = cache.renders if render_cache is None else render_cache
+        return self
+
+    def uncache(self):
+        '''Stops reusing this Container's rendered output, see cache'''
+        self._render_cache = None
+        return self
+
+    def _output_stored(self, to, formatted=False, indent=0, indentation='  '):
+        if getattr(self, '_frozen', None) is not None:
+            return self._output_frozen(to, self._frozen, formatted, indent, indentation)
+
+        render_cache = self._render_cache
+        key = (indent, indentation) if formatted else None
+        rendered = render_cache.get(self, key, self.version)
+        if rendered is None:
+            self._render_cache = None
+            try:
+                rendered = self.render(formatted=formatted, indent=indent, indentation=indentation)
+            finally:
+                self._render_cache = render_cache
+            render_cache.set(self, key, self.version, rendered)
+            observe(self)
+        to.write(rendered)
+        return self
+
+    def _output_frozen(self, to, frozen, formatted=False, indent=0, indentation='  '):
+        key = (indent, indentation) if formatted else None
+        rendered = frozen.get(key)
+        if rendered is None:
+            self._frozen = None
+            try:
+                rendered = frozen[key] = self.render(formatted=formatted, indent=indent, indentation=indentation)
+            finally:
+                self._frozen = frozen
+        to.write(rendered)
+        return self
+
     def __call__(self, *blox, position=None):
         '''Adds a nested blok to this blok'''
         if position is not None:
@@ -312,20 +1076,37 @@ class Container(Blok):
 
     def output(self, to=None, formatted=False, indent=0, indentation='  ', *args, **kwargs):
         '''Outputs to a stream (like a file or request)'''
-        if formatted and self.blox:
-            self.blox[0].output(to=to, formatted=True, indent=indent, indentation=indentation, *args, **kwargs)
-            for blok in self.blox[1:]:
-                to.write('\n')
-                to.write(indent * indentation)
-                blok.output(to=to, formatted=True, indent=indent, indentation=indentation, *args, **kwargs)
-            if not indent:
-                to.write('\n')
-        else:
-            for blok in self.blox:
-                blok.output(to=to, *args, **kwargs)
+        if getattr(self, '_frozen', None) is not None or getattr(self, '_render_cache', None) is not None:
+            return self._output_stored(to, formatted, indent, indentation)
+
+        _output(self, to, formatted, indent, indentation, *args, **kwargs)
+        return self
 
+    def output_bytes(self, buffer, formatted=False, *args, **kwargs):
+        '''Outputs utf8 encoded to the end of a bytearray'''
+        if (formatted or type(self).output not in STANDARD_OUTPUTS or getattr(self, '_frozen', None) is not None or
+                getattr(self, '_render_cache', None) is not None):
+            return self.output(Encoder(buffer), formatted, *args, **kwargs)
+
+        _output_bytes(self, buffer, *args, **kwargs)
         return self
 
+    def stream(self, to=None, formatted=False, indent=0, indentation='  ', *args, **kwargs):
+        '''Outputs to a stream one child at a time, yielding whenever what has been written so far can be sent'''
+        if type(self).output not in STANDARD_OUTPUTS:
+            yield from Blok.stream(self, to, formatted, indent, indentation, *args, **kwargs)
+            return
+
+        if getattr(self, '_frozen', None) is not None or getattr(self, '_render_cache', None) is not None:
+            self._output_stored(to, formatted, indent, indentation)
+            yield
+            return
+
+        if formatted:
+            yield from _formatted_steps(self, to, indent, indentation, *args, **kwargs)
+        else:
+            yield from _steps(self, to, *args, **kwargs)
+
 
 class AbstractTag(Blok):
     '''A Blok that renders a single tag'''
@@ -355,53 +1136,100 @@ class AbstractTag(Blok):
 
     @property
     def attributes(self):
-        '''Lazily creates and returns a tags attributes'''
+        '''Lazily creates and returns a tags ad-hoc attributes: those without a declared Attribute, which are stored
+           compactly by position instead. Changes made to the returned dict are tracked like any other attribute change
+        '''
         if not hasattr(self, '_attributes'):
-            self._attributes = {}
+            self._attributes = TrackedDict(owner=self)
 
         return self._attributes
 
+    def _changed(self):
+        self._start_tag = self._start_tag_bytes = None
+        super()._changed()
+
     @property
     def start_tag(self):
-        '''Returns the elements HTML start tag'''
+        '''Returns the elements HTML start tag, only re-rendering it when an attribute has changed'''
+        start_tag = getattr(self, '_start_tag', None)
+        if start_tag is None:
+            start_tag = self._start_tag = self.render_start_tag()
+        return start_tag
+
+    @property
+    def start_tag_bytes(self):
+        '''Returns the elements utf8 encoded HTML start tag, only re-encoding it when an attribute has changed'''
+        start_tag_bytes = getattr(self, '_start_tag_bytes', None)
+        if start_tag_bytes is None:
+            start_tag_bytes = self._start_tag_bytes = self.start_tag.encode('utf8')
+        return start_tag_bytes
+
+    def render_start_tag(self):
+        '''Renders the elements HTML start tag from its current attributes
+           NOTE: every subclass is given a faster version of this, specialized to its tag and attributes
+        '''
         direct_attributes = (attribute.render(self) for attribute in self.render_attributes)
-        attributes = ()
-        if hasattr(self, '_attributes'):
-            attributes = ('{0}="{1}"'.format(key, value)
-                                             for key, value in self.attributes.items() if value)
+        attributes = ('{0}="{1}"'.format(key, value) for key, value in self.attribute_values() if value)
 
         rendered_attributes = " ".join(filter(bool, chain(direct_attributes, attributes)))
         return '<{0}{1}{2}{3}>'.format(self.tag, ' ' if rendered_attributes else '',
                                        rendered_attributes, ' /' if self.tag_self_closes else "")
 
-    @property
-    def end_tag(self):
-        '''Returns the elements HTML end tag'''
+    def render_end_tag(self):
+        '''Renders the elements HTML end tag'''
         if self.tag_self_closes:
             return ''
 
         return "</{0}>".format(self.tag)
 
+    end_tag = property(render_end_tag, doc='Returns the elements HTML end tag')
+
+    def render_end_tag_bytes(self):
+        '''Renders the elements HTML end tag utf8 encoded'''
+        return self.end_tag.encode('utf8')
+
+    end_tag_bytes = property(render_end_tag_bytes, doc='Returns the elements utf8 encoded HTML end tag')
+
     def output(self, to=None, *args, **kwargs):
         '''Outputs to a stream (like a file or request)'''
         to.write(self.start_tag)
         if not self.tag_self_closes:
             to.write(self.end_tag)
 
+    def output_bytes(self, buffer, *args, **kwargs):
+        '''Outputs utf8 encoded to the end of a bytearray'''
+        buffer += self.start_tag_bytes
+        buffer += self.end_tag_bytes
+        return self
+
     def get(self, attribute, default=None):
         if attribute in self.attribute_descriptors.keys():
             return getattr(self, attribute, default)
         else:
             return self.attributes.get(default)
 
+    def attribute_values(self):
+        '''Returns the name and value of every set declared Attribute, followed by every ad-hoc attribute'''
+        values = getattr(self, '_values', ())
+        if type(values) == dict:
+            values = ((self.value_names[index], value) for index, value in sorted(values.items()))
+        else:
+            values = zip(self.value_names, values)
+        values = [(name, value) for name, value in values if value is not None]
+        values.extend(getattr(self, '_attributes', {}).items())
+        return values
+
     def __contains__(self, attribute):
-        return attribute in self.attributes
+        if attribute in getattr(self, '_attributes', ()):
+            return True
+        descriptor = self.attribute_descriptors.get(self.attribute_map.get(attribute, attribute))
+        return isinstance(descriptor, Attribute) and descriptor.value(self) is not None
 
     def __getitem__(self, attribute):
         if attribute in self.attribute_descriptors.keys():
             return getattr(self, attribute)
         else:
-            return self.attributes[attribute]
+            return getattr(self, '_attributes', {})[attribute]
 
     def __setitem__(self, attribute, value):
         if attribute in self.attribute_descriptors.keys():
@@ -420,7 +1248,7 @@ class AbstractTag(Blok):
 
 class Tag(AbstractTag):
     '''A Blok that renders a single tag'''
-    __slots__ = ('_attributes', '_id', '_classes')
+    __slots__ = ('_values', '_attributes', '_id', '_classes', '_start_tag', '_start_tag_bytes')
 
 
 class NamedTag(Tag):
@@ -436,7 +1264,7 @@ class NamedTag(Tag):
 
 class TagWithChildren(Container, AbstractTag):
     '''Defines a tag that can contain children'''
-    __slots__ = ('_attributes', '_id', '_classes')
+    __slots__ = ('_values', '_attributes', '_id', '_classes', '_start_tag', '_start_tag_bytes')
     tag = ""
     tag_self_closes = False
 
@@ -449,25 +1277,10 @@ class TagWithChildren(Container, AbstractTag):
 
     def output(self, to=None, formatted=False, indent=0, indentation='  ', *args, **kwargs):
         '''Outputs to a stream (like a file or request)'''
-        if formatted:
-            to.write(self.start_tag)
-            to.write('\n')
-            if not self.tag_self_closes:
-                for blok in self.blox:
-                    to.write(indentation * (indent + 1))
-                    blok.output(to=to, indent=indent + 1, formatted=True, indentation=indentation, *args, **kwargs)
-                    to.write('\n')
-
-            to.write(indentation * indent)
-            to.write(self.end_tag)
-            if not indentation:
-                to.write('\n')
-        else:
-            to.write(self.start_tag)
-            if not self.tag_self_closes:
-                for blok in self.blox:
-                    blok.output(to=to, *args, **kwargs)
-            to.write(self.end_tag)
+        if getattr(self, '_frozen', None) is not None or getattr(self, '_render_cache', None) is not None:
+            return self._output_stored(to, formatted, indent, indentation)
+
+        _output(self, to, formatted, indent, indentation, *args, **kwargs)
 
     def __contains__(self, attribute_or_blok):
         return Container.__contains__(self, attribute_or_blok) or AbstractTag.__contains__(self, attribute_or_blok)
@@ -504,3 +1317,8 @@ class Wildcard(TagWithChildren):
     def __init__(self, tag, *kargs, **kwargs):
         self.tag = tag
 
+
+CONTAINER_OUTPUT = Container.output
+CONTAINER_OUTPUT_BYTES = Container.output_bytes
+TAG_OUTPUT = TagWithChildren.output
+STANDARD_OUTPUTS = (CONTAINER_OUTPUT, TAG_OUTPUT)
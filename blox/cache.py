@@ -0,0 +1,126 @@
+'''blox/cache.py
+
+Defines a memory capped, least recently used, store of rendered blox
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+'''
+from collections import OrderedDict
+from functools import partial
+from sys import getsizeof
+from threading import RLock
+from weakref import ref
+
+MAX_SIZE = 32 * 1024 * 1024
+
+
+class RenderCache(object):
+    '''Stores the rendered output of blox by version, evicting the least recently used once max_size bytes are held
+
+       Only a weak reference to every blok is kept: a blok's renderings are dropped as soon as it is garbage collected,
+       so the cache never keeps a tree alive and max_size bounds all the memory it holds on to
+
+       Safe to share between threads: every access holds the cache's lock
+    '''
+    __slots__ = ('max_size', 'size', 'hits', 'misses', 'evictions', 'entries', 'references', 'lock')
+
+    def __init__(self, max_size=MAX_SIZE):
+        self.max_size = max_size
+        self.lock = RLock()
+        self.entries = OrderedDict()
+        self.references = {}
+        self.clear()
+
+    def get(self, blok, key, version):
+        '''Returns the stored rendering of blok for key if it was stored at the given version, otherwise None'''
+        with self.lock:
+            entry = self.entries.get((id(blok), key))
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.entries.move_to_end((id(blok), key))
+            return entry[1]
+
+    def set(self, blok, key, version, rendered):
+        '''Stores the rendering of blok for key at the given version'''
+        with self.lock:
+            size = getsizeof(rendered)
+            if size > self.max_size:
+                return
+
+            self.discard(blok, key)
+            blok_id = id(blok)
+            if blok_id not in self.references:
+                self.references[blok_id] = (ref(blok, partial(self._collected, blok_id)), set())
+            self.references[blok_id][1].add(key)
+            self.entries[(blok_id, key)] = (version, rendered, size)
+            self.size += size
+            while self.size > self.max_size:
+                (blok_id, key), entry = self.entries.popitem(last=False)
+                self._forget(blok_id, key)
+                self.size -= entry[2]
+                self.evictions += 1
+
+    def discard(self, blok, key):
+        '''Removes the stored rendering of blok for key, if there is one'''
+        with self.lock:
+            self._discard(id(blok), key)
+
+    def _discard(self, blok_id, key):
+        entry = self.entries.pop((blok_id, key), None)
+        if entry is not None:
+            self._forget(blok_id, key)
+            self.size -= entry[2]
+
+    def _forget(self, blok_id, key):
+        reference = self.references.get(blok_id)
+        if reference is not None:
+            reference[1].discard(key)
+            if not reference[1]:
+                del self.references[blok_id]
+
+    def _collected(self, blok_id, reference):
+        '''Drops every rendering of a blok that has been garbage collected'''
+        with self.lock:
+            stored = self.references.get(blok_id)
+            if stored is not None and stored[0] is reference:
+                for key in tuple(stored[1]):
+                    self._discard(blok_id, key)
+
+    def clear(self):
+        '''Removes every stored rendering and resets the statistics'''
+        with self.lock:
+            self.entries.clear()
+            self.references.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        '''Returns the current statistics of the cache, suitable for exporting as metrics'''
+        with self.lock:
+            return {'entries': len(self.entries), 'size': self.size, 'max_size': self.max_size, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+    def __len__(self):
+        return len(self.entries)
+
+
+renders = RenderCache()
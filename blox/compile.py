@@ -19,19 +19,33 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 OTHER DEALINGS IN THE SOFTWARE.
 
 '''
+import argparse
+import fnmatch
+import hashlib
 import json
-from functools import partial
+import marshal
+import os
+import re
+import sys
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from types import SimpleNamespace
 from xml.dom import minidom
 
-from lxml.etree import HTMLParser
+from lxml.etree import HTMLParser, HTMLPullParser
 from lxml.html import fromstring
 
 from short.compile import text as grow_short
+from blox import __version__
 from blox.all import factory
-from blox.attributes import AccessorAttribute
-from blox.base import Wildcard
+from blox.attributes import AccessorAttribute, RenderedDirect
+from blox.base import Wildcard, clone
+from blox.escaping import escape_attribute
+from blox.precompiled import EXTENSIONS, extension_name, extension_path, module_name
 from blox.containers import Container
-from blox.text import Text
+from blox.text import Text, UnsafeText
 
 try:
     import Cython
@@ -40,11 +54,13 @@ except ImportError:
 
 SCRIPT_TEMPLATE = """# WARNING: DON'T EDIT AUTO-GENERATED
 
+from functools import partial
+
 from blox.base import Blox, Wildcard
-from blox.containers import Container
+from blox.containers import Container, Lazy
 from blox.text import Text, UnsafeText
-from blox.attributes import AccessorAttribute
-
+from blox.attributes import AccessorAttribute, LazyAccessorAttribute
+{imports}
 
 class Template(Container):
 {indent}__slots__ = tuple({accessors})
@@ -55,29 +71,359 @@ def build(factory):
 {indent}template = Template()
 {indent}{build_steps}
 {indent}return template
+{sections}"""
+
+SECTION_TEMPLATE = """
+
+def {name}(factory, template, section):
+{indent}{build_steps}
 """
 
+RENDER_TEMPLATE = """# WARNING: DON'T EDIT AUTO-GENERATED
 
-def string(html, start_on=None, ignore=(), use_short=True, **queries):
-    '''Returns a blox template from an html string'''
-    if use_short:
-        html = grow_short(html)
-    return _to_template(fromstring(html), start_on=start_on,
-                        ignore=ignore, **queries)
+from blox.base import Blok
+
+
+def value(content):
+{indent}return content.render() if isinstance(content, Blok) else str(content)
+
+
+def render({parameters}):
+{indent}return {body}
+"""
+
+RESERVED = ('Template', 'build', 'template', 'factory', 'section', 'partial', 'Blox', 'Wildcard', 'Container', 'Lazy',
+            'Text', 'UnsafeText', 'AccessorAttribute', 'LazyAccessorAttribute')
+SLOT = re.compile('\x00(\\w+)\x00')
+
+
+CACHE_SUFFIX = '.bloxc'
+CHUNK_SIZE = 65536
+DOCUMENT = re.compile('\\s*<(!doctype|html)', re.IGNORECASE)
+MAX_TEMPLATES = 128
+
+
+class TemplateCache(object):
+    '''Stores built templates by their source and compile arguments, evicting the least recently used past max_size'''
+    __slots__ = ('max_size', 'hits', 'misses', 'evictions', 'entries')
 
+    def __init__(self, max_size=MAX_TEMPLATES):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.clear()
 
-def file(file_object, start_on=None, ignore=(), use_short=True, **queries):
+    def get(self, key):
+        '''Returns the template stored for key, otherwise None'''
+        template = self.entries.get(key)
+        if template is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return template
+
+    def set(self, key, template):
+        '''Stores template for key'''
+        if self.max_size < 1:
+            return
+
+        self.entries[key] = template
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        '''Removes every stored template and resets the statistics'''
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        '''Returns the current statistics of the cache, suitable for exporting as metrics'''
+        return {'entries': len(self.entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+    def __len__(self):
+        return len(self.entries)
+
+
+templates = TemplateCache()
+
+
+def string(html, start_on=None, ignore=(), use_short=True, render_only=False, prototype=False, lazy=False,
+           fold=False, cache_dir=None, **queries):
+    '''Returns a blox template from an html string
+
+       With render_only a function is returned instead, that takes the templates accessors as optional keyword
+       arguments and directly returns the rendered html, without building any blox.
+
+       With prototype the template is built once and every call returns a structural clone of it, skipping the
+       build steps.
+
+       With lazy every dynamic section of the template is only built once it is accessed (through an accessor,
+       iteration or formatted output), rendering from markup pre-rendered at compile time until then.
+
+       With fold every static subtree (one without an id, accessor or query match) is built as a single Text holding
+       its markup, pre-rendered at compile time. Templates build faster and use less memory, but those subtrees are
+       no longer blox: they can't be queried or walked, and formatted output renders each of them on one line.
+
+       Templates are kept in memory (see templates) and, if cache_dir is given, stored there and reused while the
+       template source, compile arguments, blox and Python versions all stay the same
+    '''
+    key = (html, start_on, tuple(ignore) if type(ignore) in (list, tuple) else ignore, use_short, render_only,
+           prototype, lazy, fold, tuple(sorted(queries.items())))
+    template = templates.get(key)
+    if template is None:
+        template = _build(html, start_on, ignore, use_short, render_only, lazy, fold, cache_dir, queries)
+        if prototype and not render_only:
+            template = partial(clone, template())
+        templates.set(key, template)
+    return template
+
+
+def file(file_object, start_on=None, ignore=(), use_short=True, render_only=False, prototype=False, lazy=False,
+         fold=False, cache_dir=None, **queries):
     '''Returns a blox template from a file stream object'''
-    return string(file_object.read(), start_on=start_on, ignore=ignore, use_short=use_short, **queries)
+    return string(file_object.read(), start_on=start_on, ignore=ignore, use_short=use_short,
+                  render_only=render_only, prototype=prototype, lazy=lazy, fold=fold, cache_dir=cache_dir, **queries)
 
 
-def filename(file_name, start_on=None, ignore=(), use_short=True, **queries):
+def filename(file_name, start_on=None, ignore=(), use_short=True, render_only=False, prototype=False, lazy=False,
+             fold=False, cache_dir=None, **queries):
     '''Returns a blox template from a valid file path'''
     with open(file_name) as template_file:
-        return file(template_file, start_on=start_on, ignore=ignore, use_short=use_short, **queries)
+        return file(template_file, start_on=start_on, ignore=ignore, use_short=use_short, render_only=render_only,
+                    prototype=prototype, lazy=lazy, fold=fold, cache_dir=cache_dir, **queries)
+
+
+def stream(source, chunk_size=CHUNK_SIZE):
+    '''Returns a blox template from a file path or file object, compiling it incrementally as it is read and parsed,
+       so memory use is bounded by the depth of the document rather than its size
+
+       Static elements (those without an id or accessor) are always folded into pre-rendered Text, see string's fold
+
+       NOTE: short expansion, start_on, ignore and queries all need the whole document, so are not supported
+    '''
+    if isinstance(source, str):
+        with open(source) as source_file:
+            return stream(source_file, chunk_size)
+
+    first = source.read(max(chunk_size, 1024))
+    fragment = not DOCUMENT.match(first if isinstance(first, str) else first.decode('utf8', 'ignore'))
+    return _to_builder(_to_code(_to_python(_events(source, first, chunk_size), factory, indent='    ', streamed=True,
+                                           fragment=fragment)))
+
+
+def convert(html, factory=factory):
+    '''Returns a Container holding the given html, or lxml element tree, converted directly into blox
+       without generating or executing any code - ideal for one off (sanitized) user supplied fragments
+    '''
+    container = Container()
+    _convert(fromstring(html) if isinstance(html, (str, bytes)) else html, container, factory)
+    return container
+
+
+def directory(source, output, pattern='*.html', processes=None, use_short=True, render_only=False, cython=False,
+              lazy=False, fold=False):
+    '''Compiles every template under source matching pattern, in a pool of processes, writing the generated modules
+       to the same relative paths under output (to be loaded with blox.precompiled.Templates)
+
+       With cython every generated module is also compiled to an extension module (see cythonize)
+
+       Returns the relative names of the compiled templates
+    '''
+    template_names = []
+    for root, directories, file_names in os.walk(source):
+        directories.sort()
+        for file_name in sorted(fnmatch.filter(file_names, pattern)):
+            template_names.append(os.path.relpath(os.path.join(root, file_name), source))
+
+    with ProcessPoolExecutor(processes) as pool:
+        modules = pool.map(partial(_compile_module, source, use_short=use_short, render_only=render_only,
+                                   lazy=lazy, fold=fold), template_names)
+        for template_name, python in zip(template_names, modules):
+            module_path = os.path.join(output, module_name(template_name))
+            os.makedirs(os.path.dirname(module_path), exist_ok=True)
+            with open(module_path, 'w') as module_file:
+                module_file.write(python)
+        if cython:
+            module_paths = [os.path.join(output, module_name(template_name)) for template_name in template_names]
+            list(pool.map(cythonize, module_paths, [os.path.join(output, EXTENSIONS)] * len(module_paths)))
+    return template_names
+
+
+def cythonize(module_path, extensions):
+    '''Compiles a generated template module with Cython to an extension module inside the extensions directory,
+       keyed by a hash of the module's source so it is only rebuilt when the template changes
+
+       Returns the path of the extension module, or None if Cython (or a C compiler) is not available
+    '''
+    name = extension_name(module_path)
+    compiled = extension_path(extensions, name)
+    if os.path.exists(compiled):
+        return compiled
+
+    try:
+        from Cython.Build import cythonize as cython_compile
+        from distutils.core import Distribution, Extension
+        from distutils.command.build_ext import build_ext
+        from distutils.errors import CCompilerError, DistutilsError
+    except ImportError:
+        return None
+
+    os.makedirs(extensions, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=extensions) as build_directory:
+        cython_source = os.path.join(build_directory, name + '.py')
+        with open(module_path) as module_file, open(cython_source, 'w') as cython_file:
+            cython_file.write(module_file.read())
+
+        builder = build_ext(Distribution({'ext_modules': cython_compile([Extension(name, [cython_source])],
+                                                                       quiet=True, language_level=3)}))
+        builder.build_lib = build_directory
+        builder.build_temp = build_directory
+        try:
+            builder.ensure_finalized()
+            builder.run()
+        except (CCompilerError, DistutilsError):
+            return None
+        os.replace(builder.get_ext_fullpath(name), compiled)
+    return compiled
+
+
+def main(arguments=None):
+    '''Precompiles a directory of templates, see: python -m blox.compile --help'''
+    parser = argparse.ArgumentParser(prog='python -m blox.compile', description=main.__doc__.split(',')[0])
+    parser.add_argument('source', help='the directory of templates to compile')
+    parser.add_argument('output', help='the directory to write the compiled modules to')
+    parser.add_argument('--pattern', default='*.html', help='only compile file names matching this pattern')
+    parser.add_argument('--processes', type=int, default=None, help='the number of compiling processes')
+    parser.add_argument('--render-only', action='store_true', help='compile to render only functions')
+    parser.add_argument('--no-short', dest='use_short', action='store_false', help='skip short expansion')
+    parser.add_argument('--cython', action='store_true', help='also compile the modules to Cython extensions')
+    parser.add_argument('--lazy', action='store_true', help='only build dynamic sections once they are accessed')
+    parser.add_argument('--fold', action='store_true', help='build static subtrees as pre-rendered text')
+    options = parser.parse_args(arguments)
+    for template_name in directory(options.source, options.output, options.pattern, options.processes,
+                                   options.use_short, options.render_only, options.cython, options.lazy,
+                                   options.fold):
+        print(template_name)
+
+
+def _compile_module(source, template_name, use_short=True, render_only=False, lazy=False, fold=False):
+    with open(os.path.join(source, template_name)) as template_file:
+        dom = _parse(template_file.read(), use_short)
+    return (_to_render_python if render_only else _to_python)(dom, factory, indent='    ', lazy=lazy, fold=fold)
+
+
+def _build(html, start_on, ignore, use_short, render_only, lazy, fold, cache_dir, queries):
+    if cache_dir and not (Cython and hasattr(Cython, 'inline')):
+        cache_file = os.path.join(cache_dir, _cache_key(html, start_on, ignore, use_short, render_only, lazy, fold,
+                                                        queries) + CACHE_SUFFIX)
+        code = _load_code(cache_file)
+        if code is None:
+            to_python = _to_render_python if render_only else _to_python
+            code = _to_code(to_python(_parse(html, use_short), factory, indent='    ', start_on=start_on,
+                                      ignore=ignore, lazy=lazy, fold=fold, **queries))
+            _store_code(cache_file, code)
+        return _to_builder(code)
+
+    return _to_template(_parse(html, use_short), start_on=start_on, ignore=ignore, render_only=render_only,
+                        lazy=lazy, fold=fold, **queries)
+
+
+def _convert(node, parent, factory=factory):
+    if type(node.tag) != str:
+        return
+
+    blok = parent(factory(node.tag))
+    reference, supports_text, blok_attributes, attribute_map = _describe(factory.get(node.tag))
+    _convert_text(node.text, blok, supports_text)
+    for attribute_name, attribute_value in node.items():
+        attribute_name = attribute_map.get(attribute_name, attribute_name)
+        if attribute_name != 'accessor':
+            descriptor = getattr(blok, 'attribute_descriptors', {}).get(attribute_name)
+            if not isinstance(descriptor, RenderedDirect) or descriptor.safe:
+                attribute_value = escape_attribute(attribute_value)
+            blok[attribute_name] = attribute_value
+
+    for child_node in node:
+        if child_node.tag in blok_attributes:
+            attached = blok_attributes[child_node.tag]
+            for nested_child_node in child_node:
+                _convert(nested_child_node, getattr(blok, attached.name), factory)
+            _convert_text(child_node.text, getattr(blok, attached.name), _describe(attached.type)[1])
+        else:
+            _convert(child_node, blok, factory)
+        _convert_text(child_node.tail, blok, False)
+
+
+def _convert_text(text, blok, supports_text):
+    text = (text or "").strip()
+    if text:
+        if supports_text:
+            blok.text = UnsafeText(text)
+        else:
+            blok(UnsafeText(text))
+
+
+def _events(source, chunk, chunk_size=CHUNK_SIZE):
+    parser = HTMLPullParser(events=('start', 'end'), remove_comments=True)
+    while chunk:
+        parser.feed(chunk)
+        yield from parser.read_events()
+        chunk = source.read(chunk_size)
+    parser.close()
+    yield from parser.read_events()
+
+
+def _parse(html, use_short=True):
+    if use_short:
+        html = grow_short(html)
+    return fromstring(html)
 
 
-def _to_python(dom, factory=factory, indent='    ', start_on=None, ignore=(), **queries):
+def _cache_key(html, start_on, ignore, use_short, render_only, lazy, fold, queries):
+    key = (html, start_on, ignore, use_short, render_only, lazy, fold, sorted(queries.items()), __version__,
+           sys.implementation.cache_tag)
+    return hashlib.sha1(repr(key).encode('utf8')).hexdigest()
+
+
+def _load_code(cache_file):
+    try:
+        with open(cache_file, 'rb') as cached:
+            return marshal.load(cached)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def _store_code(cache_file, code):
+    directory = os.path.dirname(cache_file)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as cached:
+            marshal.dump(code, cached)
+        os.replace(temporary, cache_file)
+    except OSError:
+        pass
+
+
+@lru_cache(maxsize=None)
+def _describe(blok):
+    '''Returns what compiling needs to know about a Blok class, computed once per class:
+       the (module, name) it can be imported by (None if it can't be), whether it supports text, its blok_attributes
+       and its attribute_map
+    '''
+    module = sys.modules.get(blok.__module__)
+    reference = (blok.__module__, blok.__name__) if getattr(module, blok.__name__, None) is blok else None
+    return (reference, 'text' in dir(blok), getattr(blok, 'blok_attributes', {}), getattr(blok, 'attribute_map', {}))
+
+
+def _to_python(dom, factory=factory, indent='    ', start_on=None, ignore=(), lazy=False, fold=False, streamed=False,
+               fragment=False, **queries):
     if start_on:
         dom = dom.cssselect(start_on)[0]
 
@@ -88,11 +434,32 @@ def _to_python(dom, factory=factory, indent='    ', start_on=None, ignore=(), **
     current = [0]
     def increment(element_name=''):
         current[0] += 1
-        return ('{0}{1}'.format(element_name, current[0]), factory.get(element_name))
+        return '{0}{1}'.format(re.sub('\\W', '_', element_name), current[0])
+
+    references = {}
+    imports = OrderedDict()
+    def constructor(tag):
+        '''Returns the code that creates the Blok for tag, referencing its class directly where possible'''
+        if tag not in references:
+            blok = factory.get(tag)
+            reference = _describe(blok)[0]
+            if tag not in factory:
+                references[tag] = ('Wildcard' if blok is Wildcard else 'factory', repr(tag))
+            elif reference is None:
+                references[tag] = ('factory', repr(tag))
+            else:
+                module_name, name = reference
+                if name in RESERVED or imports.get(name, blok) is not blok:
+                    name = '{0}_{1}'.format(module_name.replace('.', '_'), name)
+                imports[name] = blok
+                references[tag] = (name, '')
+        return '{0}({1})'.format(*references[tag])
 
     lines = []
     accessors = list(queries.keys())
-    attributes = []
+    attributes = OrderedDict()
+    accessor_type = 'LazyAccessorAttribute' if lazy else 'AccessorAttribute'
+    sections = []
 
     matches = {}
     for accessor, query in queries.items():
@@ -100,66 +467,222 @@ def _to_python(dom, factory=factory, indent='    ', start_on=None, ignore=(), **
         for match in dom.cssselect(query):
             matches[match] = accessor
 
-    def compile_node(node, parent='template'):
+    def is_static(node):
+        for element in node.iter():
+            if element in matches or 'id' in element.keys() or 'accessor' in element.keys():
+                return False
+        return True
+
+    def render(node, fold=True):
+        static_lines = []
+        compile_node(node, parent='static', lines=static_lines, fold=fold, lazy=False)
+        name_space = dict(imports, static=Container(), factory=factory, Wildcard=Wildcard, Text=Text,
+                          template=SimpleNamespace())
+        exec('\n'.join(static_lines), name_space)
+        return name_space['static'].render()
+
+    def compile_node(node, parent='template', lines=lines, fold=fold, defer=False, lazy=lazy):
         if node in ignored or type(node.tag) != str:
             return
 
-        blok_name, blok = increment(node.tag)
-        lines.append("{0} = {1}({2}('{3}'))".format(blok_name, parent, 'factory' if blok else 'Wildcard', node.tag))
-        if not blok:
-            blok = Wildcard
-        if node in matches:
-            lines.append('template.{0}.append({1})'.format(matches[node], blok_name))
+        if fold and is_static(node):
+            lines.append('{0}(Text({1}))'.format(parent, repr(render(node, fold=False))))
+            return
 
-        text = (node.text or "").strip().replace('"', '\\"')
-        if text:
-            if 'text' in dir(blok):
-                lines.append('{0}.text = """{1}"""'.format(blok_name, text))
+        if defer and len(node) and not any(element in matches for element in node.iter()):
+            section_name = increment('lazy')
+            lines.append("{0} = {1}(Lazy({2}, partial(build_{0}, factory), template))".format(section_name, parent,
+                                                                                           repr(render(node))))
+            for element in node.iter():
+                accessor = element.get('accessor', element.get('id')) if type(element.tag) == str else None
+                if accessor:
+                    lines.append('template._{0}_parent = {1}'.format(accessor.replace('-', '_'), section_name))
+            section_lines = []
+            compile_node(node, parent='section', lines=section_lines, fold=fold)
+            sections.append(SECTION_TEMPLATE.format(name='build_' + section_name, indent=indent,
+                                                    build_steps="\n{indent}".join(section_lines)))
+            return
+
+        blok_name = increment(node.tag)
+        blok_attributes = compile_head(node, blok_name, parent, lines)
+        for child_node in node:
+            if child_node.tag in blok_attributes:
+                attached_child = "{0}.{1}".format(blok_name, blok_attributes[child_node.tag].name)
+                for nested_child_node in child_node:
+                    compile_node(nested_child_node, parent=attached_child, lines=lines, fold=fold, defer=lazy,
+                                 lazy=lazy)
+                compile_text(child_node.text, attached_child, _describe(blok_attributes[child_node.tag].type)[1],
+                             lines)
             else:
-                lines.append('{0}(Text("""{1}"""))'.format(blok_name, text))
+                compile_node(child_node, parent=blok_name, lines=lines, fold=fold, defer=lazy, lazy=lazy)
+            compile_text(child_node.tail, blok_name, False, lines)
+
+    def compile_head(node, blok_name, parent, lines):
+        '''Compiles the creation, text and attributes of a single node, returning its blok_attributes'''
+        lines.append("{0} = {1}({2})".format(blok_name, parent, constructor(node.tag)))
+        reference, supports_text, blok_attributes, attribute_map = _describe(factory.get(node.tag))
+        if node in matches:
+            lines.append('template.{0}.append({1})'.format(matches[node], blok_name))
+        compile_text(node.text, blok_name, supports_text, lines)
 
         if 'id' in node.keys() and not 'accessor' in node.keys():
             node.set('accessor', node.get('id'))
         for attribute_name, attribute_value in node.items():
-            attribute_name = getattr(blok, 'attribute_map', {}).get(attribute_name, attribute_name)
+            attribute_name = attribute_map.get(attribute_name, attribute_name)
             if attribute_name == 'accessor':
                 attribute_value = attribute_value.replace('-', '_')
-                attributes.append("{0} = AccessorAttribute(Text)".format(attribute_value))
+                attributes[attribute_value] = "{0} = {1}(Text)".format(attribute_value, accessor_type)
                 lines.append('template._{0}_parent = {1}'.format(attribute_value, parent))
                 lines.append('template.{0} = {1}'.format(attribute_value, blok_name))
             else:
                 lines.append('{0}["{1}"] = "{2}"'.format(blok_name, attribute_name.replace('"', '\\"'),
                                                          attribute_value.replace('"', '\\"')))
+        return blok_attributes
 
-        for child_node in node:
-            if child_node.tag in getattr(blok, 'blok_attributes', {}):
-                attached_child = "{0}.{1}".format(blok_name, blok.blok_attributes[child_node.tag].name)
-                for nested_child_node in child_node:
-                    compile_node(nested_child_node, parent=attached_child)
-                attached_text = (child_node.text or "").strip().replace('"', '\\"')
-                if attached_text:
-                    if 'text' in dir(blok.blok_attributes[child_node.tag].type):
-                        lines.append('{0}.text = """{1}"""'.format(attached_child, attached_text))
-                    else:
-                        lines.append('{0}(Text("""{1}"""))'.format(attached_child, attached_text))
+    def compile_text(text, blok_name, supports_text, lines):
+        text = (text or "").strip().replace('"', '\\"')
+        if text:
+            if supports_text:
+                lines.append('{0}.text = """{1}"""'.format(blok_name, text))
+            else:
+                lines.append('{0}(Text("""{1}"""))'.format(blok_name, text))
+
+    def compile_events(events):
+        stack = [SimpleNamespace(element=None, name='template', kind='template', blok_attributes={}, lines=lines,
+                                 parts=[], static=True, started=True, last=None)]
+        for event, element in events:
+            parent = stack[-1]
+            if event == 'start':
+                compile_children(parent)
+                if fragment and parent.kind in ('template', 'implied') and element.tag in ('html', 'body'):
+                    frame = SimpleNamespace(name=parent.name, kind='implied', blok_attributes={}, supports_text=False)
+                elif element.tag in parent.blok_attributes:
+                    attached = parent.blok_attributes[element.tag]
+                    frame = SimpleNamespace(name='{0}.{1}'.format(parent.name, attached.name), kind='attached',
+                                            blok_attributes={}, supports_text=_describe(attached.type)[1])
+                else:
+                    reference, supports_text, blok_attributes, attribute_map = _describe(factory.get(element.tag))
+                    frame = SimpleNamespace(name=increment(element.tag), kind='blok', parent=parent.name,
+                                            blok_attributes=blok_attributes, supports_text=supports_text,
+                                            attribute_map=attribute_map)
+                frame.element = element
+                frame.lines = []
+                frame.parts = []
+                frame.static = not ('id' in element.keys() or 'accessor' in element.keys() or frame.blok_attributes)
+                frame.started = False
+                frame.last = None
+                stack.append(frame)
+            else:
+                frame = stack.pop()
+                parent = stack[-1]
+                compile_children(frame)
+                if frame.kind == 'blok' and frame.static:
+                    markup = render_static(frame)
+                    parent.lines.append('{0}(Text({1}))'.format(parent.name, repr(markup)))
+                    parent.parts.append(markup)
+                else:
+                    parent.lines.extend(frame.lines)
+                    parent.static = parent.static and frame.static and frame.kind != 'attached'
+                element.text = None
+                element.attrib.clear()
+                parent.last = element
+
+    def compile_children(frame):
+        '''Compiles what is known once a streamed element gets its next child, or ends: its head and last tail'''
+        if not frame.started:
+            frame.started = True
+            if frame.kind == 'blok':
+                compile_head(frame.element, frame.name, frame.parent, frame.lines)
             else:
-                compile_node(child_node, parent=blok_name)
-
-            tail = (child_node.tail or "").strip().replace('"', '\\"')
-            if tail:
-                lines.append('{0}(Text("""{1}"""))'.format(blok_name, tail))
-    compile_node(dom)
-    return SCRIPT_TEMPLATE.format(accessors=json.dumps(accessors),
-                                  attributes="\n{indent}".join(attributes).replace("{indent}", indent),
+                compile_text(frame.element.text, frame.name, frame.supports_text, frame.lines)
+        if frame.last is not None:
+            compile_text(frame.last.tail, frame.name, False, frame.lines)
+            if (frame.last.tail or '').strip():
+                frame.parts.append(frame.last.tail.strip())
+            frame.last.getparent().remove(frame.last)
+            frame.last = None
+
+    def render_static(frame):
+        '''Renders a streamed element, all of whose children were already rendered to parts, without compiling it'''
+        element = frame.element
+        blok = factory(element.tag)
+        text = (element.text or '').strip()
+        if text:
+            if frame.supports_text:
+                blok.text = text
+            else:
+                blok(Text(text))
+        for attribute_name, attribute_value in element.items():
+            blok[frame.attribute_map.get(attribute_name, attribute_name)] = attribute_value
+        for part in frame.parts:
+            blok(Text(part))
+        return blok.render()
+
+    if streamed:
+        compile_events(dom)
+    else:
+        compile_node(dom)
+    return SCRIPT_TEMPLATE.format(imports="".join('from {0} import {1}{2}\n'.format(
+                                      blok.__module__, blok.__name__,
+                                      '' if name == blok.__name__ else ' as ' + name) for name, blok in imports.items()),
+                                  accessors=json.dumps(accessors),
+                                  attributes="\n{indent}".join(attributes.values()).replace("{indent}", indent),
                                   build_steps="\n{indent}".join(lines).replace("{indent}", indent),
+                                  sections="".join(sections).replace("{indent}", indent),
                                   indent=indent)
 
 
-def _to_template(dom, factory=factory, start_on=None, ignore=(), **queries):
-    code = _to_python(dom, factory, indent='    ', start_on=start_on, ignore=ignore, **queries)
+def _to_render_python(dom, factory=factory, indent='    ', start_on=None, ignore=(), lazy=False, fold=False,
+                      **queries):
+    template = _to_builder(_to_code(_to_python(dom, factory, indent=indent, start_on=start_on, ignore=ignore,
+                                               fold=True, **queries)), factory)()
+    accessors = [name for name, attribute in vars(type(template)).items() if isinstance(attribute, AccessorAttribute)]
+
+    defaults = {}
+    for accessor in reversed(accessors):
+        blok = getattr(template, accessor)
+        if blok is not None:
+            defaults[accessor] = blok.render()
+            setattr(template, accessor, '\x00{0}\x00'.format(accessor))
+
+    def expression(rendered):
+        parts = SLOT.split(rendered)
+        chunks = []
+        for index, part in enumerate(parts):
+            if index % 2:
+                chunks.append('({0} if {1} is None else value({1}))'.format(expression(defaults[part]), part))
+            elif part:
+                chunks.append(repr(part))
+        if len(parts) == 1:
+            return chunks[0] if chunks else "''"
+        return "''.join(({0}, ))".format(', '.join(chunks))
+
+    parameters = ['{0}=None'.format(name) for name in accessors if name in defaults]
+    return RENDER_TEMPLATE.format(parameters=', '.join(['*'] + parameters if parameters else []),
+                                  body=expression(template.render()), indent=indent)
+
+
+def _to_code(python):
+    return compile(python, '<string>', 'exec')
+
+
+def _to_builder(code, factory=factory):
+    name_space = {}
+    exec(code, name_space)
+    if 'render' in name_space:
+        return name_space['render']
+    return partial(name_space['build'], factory)
+
+
+def _to_template(dom, factory=factory, start_on=None, ignore=(), render_only=False, lazy=False, fold=False,
+                 **queries):
+    to_python = _to_render_python if render_only else _to_python
+    code = to_python(dom, factory, indent='    ', start_on=start_on, ignore=ignore, lazy=lazy, fold=fold, **queries)
     if Cython and hasattr(Cython, 'inline'):
         name_space = Cython.inline(code)
-    else:
-        name_space = {}
-        exec(compile(code, '<string>', 'exec'), name_space)
-    return partial(name_space['build'], factory)
+        return name_space['render'] if render_only else partial(name_space['build'], factory)
+    return _to_builder(_to_code(code), factory)
+
+
+if __name__ == '__main__':
+    main()
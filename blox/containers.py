@@ -20,9 +20,61 @@ OTHER DEALINGS IN THE SOFTWARE.
 
 '''
 
-from blox.base import Container
+from blox.base import Children, Container
 from blox.builder import Factory
 
 factory = Factory("Containers")
 
 factory.add()(Container)
+
+
+class Lazy(Container):
+    '''A Container that only builds its children once they are needed, outputting rendered in the mean time
+
+       NOTE: walking, querying, selecting or indexing blox that include a Lazy Container builds its children
+    '''
+    __slots__ = ('rendered', 'builder', 'template')
+    builds_lazily = True
+
+    def __init__(self, rendered, builder, template=None):
+        super().__init__()
+        self.rendered = rendered
+        self.builder = builder
+        self.template = template
+
+    @property
+    def built(self):
+        '''Returns True if the children of this Container have been built'''
+        return hasattr(self, '_blox')
+
+    @property
+    def blox(self):
+        '''Builds, on first access, and returns the list of child blox'''
+        if not hasattr(self, '_blox'):
+            self._blox = Children(self)
+            self.builder(self.template, self)
+        return self._blox
+
+    def output(self, to=None, formatted=False, *args, **kwargs):
+        '''Outputs to a stream (like a file or request)'''
+        if formatted or hasattr(self, '_blox'):
+            return super().output(to, formatted, *args, **kwargs)
+
+        to.write(self.rendered)
+        return self
+
+    def output_bytes(self, buffer, formatted=False, *args, **kwargs):
+        '''Outputs utf8 encoded to the end of a bytearray'''
+        if formatted or hasattr(self, '_blox'):
+            return super().output_bytes(buffer, formatted, *args, **kwargs)
+
+        buffer += self.rendered.encode('utf8')
+        return self
+
+    def stream(self, to=None, formatted=False, *args, **kwargs):
+        '''Outputs to a stream one child at a time, yielding whenever what has been written so far can be sent'''
+        if formatted or hasattr(self, '_blox'):
+            yield from super().stream(to, formatted, *args, **kwargs)
+        else:
+            to.write(self.rendered)
+            yield
@@ -45,6 +45,7 @@ class DocType(Blok):
         if type != self._type:
             self.emit('type_changed', type)
             self._type = type
+            self._changed()
 
     def output(self, to=None, formatted=False, *args, **kwargs):
         '''Outputs the set text'''
@@ -0,0 +1,39 @@
+'''blox/escaping.py
+
+Defines the fast HTML escaping used when rendering untrusted values
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+'''
+
+
+def escape(value):
+    '''Returns the given str with the HTML special characters &, < and > replaced by their entities
+
+       NOTE: the common case of nothing needing to be escaped is checked for first, returning the str untouched
+    '''
+    if '&' in value or '<' in value or '>' in value:
+        return value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    return value
+
+
+def escape_attribute(value):
+    '''Returns the given str escaped like escape, with double quotes also replaced, so it stays within an attribute'''
+    value = escape(value)
+    if '"' in value:
+        return value.replace('"', '&quot;')
+    return value
@@ -0,0 +1,178 @@
+'''blox/index.py
+
+Defines an index of the bloks below a root Container by their id, classes, tag and selected attributes
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+'''
+from collections import OrderedDict
+
+INDEXED = ('id', 'classes', 'tag')
+CASE_INSENSITIVE = ('tag', )
+COLLECTIONS = (list, tuple, set, frozenset)
+SPACING = 2 ** 48
+
+
+class Index(object):
+    '''Maps attribute values to every blok below (and including) root that has them, kept current as bloks change,
+       are added or are removed, so that looking bloks up costs as much as the number found instead of the tree size
+    '''
+    __slots__ = ('root', 'attributes', 'entries', 'keys', 'positions')
+
+    def __init__(self, root, attributes=()):
+        self.root = root
+        self.attributes = INDEXED + tuple(attribute for attribute in attributes if attribute not in INDEXED)
+        self.entries = {}
+        self.keys = {}
+        self.positions = {}
+        self.add(root)
+
+    @staticmethod
+    def value(blok, attribute):
+        '''Returns the current value of an attribute of blok, without creating it as reading a default would'''
+        descriptor = getattr(blok, 'attribute_descriptors', {}).get(attribute)
+        if descriptor is None:
+            return getattr(blok, attribute, None)
+        if hasattr(descriptor, 'object_attribute'):
+            return getattr(blok, descriptor.object_attribute, None)
+        return descriptor.value(blok) if hasattr(descriptor, 'value_index') else None
+
+    @staticmethod
+    def normalized(attribute, value):
+        '''Returns value as it is indexed for attribute: lower cased for case insensitive attributes like tag'''
+        return value.lower() if attribute in CASE_INSENSITIVE and isinstance(value, str) else value
+
+    def add(self, blok):
+        '''Indexes blok and everything below it, building any lazily built children first.
+           NOTE: once blok is among its parent's children, place (or renumber) must be called to position it
+        '''
+        positions = self.positions
+        stack = [blok]
+        while stack:
+            blok = stack.pop()
+            if getattr(blok, 'builds_lazily', False):
+                blok.blox
+            index = getattr(blok, '_index', None)
+            if index is not None and index is not self:
+                index.discard(blok)
+            blok._index = self
+            self.update(blok)
+            children = getattr(blok, '_blox', ())
+            for position, child in enumerate(children):
+                positions[child] = position * SPACING
+            stack.extend(reversed(children))
+
+    def discard(self, blok):
+        '''Removes blok and everything below it from the index'''
+        stack = [blok]
+        while stack:
+            blok = stack.pop()
+            if getattr(blok, '_index', None) is self:
+                self.remove(blok)
+                self.positions.pop(blok, None)
+                blok._index = None
+                stack.extend(getattr(blok, '_blox', ()))
+
+    def update(self, blok):
+        '''Re-indexes blok by its current attribute values'''
+        self.remove(blok)
+        keys = []
+        for attribute in self.attributes:
+            value = self.normalized(attribute, self.value(blok, attribute))
+            for item in (value if isinstance(value, COLLECTIONS) else (value, )):
+                if item is None or item == '':
+                    continue
+                try:
+                    self.entries.setdefault((attribute, item), OrderedDict())[blok] = None
+                except TypeError:
+                    continue
+                keys.append((attribute, item))
+        if keys:
+            self.keys[blok] = keys
+
+    def remove(self, blok):
+        '''Removes only blok itself from the index'''
+        for key in self.keys.pop(blok, ()):
+            bloks = self.entries[key]
+            bloks.pop(blok, None)
+            if not bloks:
+                del self.entries[key]
+
+    def place(self, children, start, stop):
+        '''Positions the bloks just added to children, from start up to stop, between their neighbours:
+           positions only order siblings, so this doesn't touch any other blok unless there is no room left
+        '''
+        positions = self.positions
+        before = positions.get(children[start - 1]) if start > 0 else None
+        after = positions.get(children[stop]) if stop < len(children) else None
+        if (before is None and start > 0) or (after is None and stop < len(children)):
+            return self.renumber(children)
+
+        count = stop - start
+        if before is None:
+            before = -SPACING if after is None else after - (count + 1) * SPACING
+        step = SPACING if after is None else (after - before) // (count + 1)
+        if step < 1:
+            return self.renumber(children)
+
+        for offset, blok in enumerate(children[start:stop], 1):
+            if getattr(blok, '_index', None) is self:
+                positions[blok] = before + offset * step
+
+    def renumber(self, children):
+        '''Positions all of children again, after they were reordered or ran out of room between them'''
+        positions = self.positions
+        for position, blok in enumerate(children):
+            if getattr(blok, '_index', None) is self:
+                positions[blok] = position * SPACING
+
+    def path(self, blok):
+        '''Returns the position of blok, and of each of its parents, among their siblings up to the root,
+           which sort bloks in document order
+        '''
+        positions = self.positions
+        path = []
+        while blok is not self.root:
+            path.append(positions[blok])
+            blok = blok._parent
+        path.reverse()
+        return path
+
+    def find(self, attribute, value):
+        '''Returns every indexed blok whose attribute is, or contains, value'''
+        return tuple(self.entries.get((attribute, self.normalized(attribute, value)), ()))
+
+    def candidates(self, **attributes):
+        '''Returns the indexed bloks that could match all of the given attributes,
+           or None if none of them are indexed with a value that can be looked up
+        '''
+        found = None
+        for attribute, expected_value in attributes.items():
+            if attribute not in self.attributes:
+                continue
+            for value in (expected_value if type(expected_value) in (list, tuple) else (expected_value, )):
+                if value is None or value == '':
+                    continue
+                try:
+                    bloks = self.entries.get((attribute, self.normalized(attribute, value)), ())
+                except TypeError:
+                    continue
+                if found is None or len(bloks) < len(found):
+                    found = bloks
+        return None if found is None else tuple(found)
+
+    def __len__(self):
+        return len(self.keys)
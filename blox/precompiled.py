@@ -0,0 +1,96 @@
+'''blox/precompiled.py
+
+Loads templates precompiled by `python -m blox.compile`, without needing lxml or short
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+'''
+import hashlib
+import os
+import re
+from functools import partial
+from importlib.machinery import EXTENSION_SUFFIXES
+from importlib.util import module_from_spec, spec_from_file_location
+
+from blox.all import factory
+
+MODULE_SUFFIX = '.py'
+EXTENSIONS = '__bloxcython__'
+
+
+def module_name(template_name):
+    '''Returns the path, relative to an output directory, of the module precompiled from a template'''
+    return os.path.splitext(template_name)[0] + MODULE_SUFFIX
+
+
+def extension_name(module_path):
+    '''Returns the name of the extension module compiled from a precompiled module, keyed by a hash of its source'''
+    with open(module_path, 'rb') as module_file:
+        return 'template_' + hashlib.sha1(module_file.read()).hexdigest()
+
+
+def extension_path(extensions, name):
+    '''Returns where the extension module with the given name is stored, inside the extensions directory'''
+    return os.path.join(extensions, name + EXTENSION_SUFFIXES[0])
+
+
+class Templates(object):
+    '''Loads templates, by their path relative to the compiled directory, from modules written by blox.compile.directory
+
+       If source is given, templates that were not precompiled are compiled from it on first use instead.
+       Modules that were also compiled with Cython (see blox.compile.cythonize) are loaded from their extension module
+       in extensions (__bloxcython__ inside directory by default), as long as it was built from the current source
+    '''
+    __slots__ = ('directory', 'source', 'extensions', 'loaded')
+
+    def __init__(self, directory, source=None, extensions=None):
+        self.directory = directory
+        self.source = source
+        self.extensions = os.path.join(directory, EXTENSIONS) if extensions is None else extensions
+        self.loaded = {}
+
+    def get(self, template_name):
+        '''Returns the template precompiled from template_name, loading it the first time it is requested'''
+        template = self.loaded.get(template_name)
+        if template is None:
+            template = self.loaded[template_name] = self._load(template_name)
+        return template
+
+    def _load(self, template_name):
+        module_path = os.path.join(self.directory, module_name(template_name))
+        if self.source and not os.path.exists(module_path):
+            from blox import compile
+            return compile.filename(os.path.join(self.source, template_name))
+
+        spec = None
+        if self.extensions:
+            name = extension_name(module_path)
+            if os.path.exists(extension_path(self.extensions, name)):
+                spec = spec_from_file_location(name, extension_path(self.extensions, name))
+        if spec is None:
+            spec = spec_from_file_location(re.sub('\\W', '_', template_name), module_path)
+        module = module_from_spec(spec)
+        spec.loader.exec_module(module)
+        if hasattr(module, 'render'):
+            return module.render
+        return partial(module.build, factory)
+
+    def __getitem__(self, template_name):
+        return self.get(template_name)
+
+    def __contains__(self, template_name):
+        return os.path.exists(os.path.join(self.directory, module_name(template_name)))
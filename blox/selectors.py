@@ -0,0 +1,154 @@
+'''blox/selectors.py
+
+Defines how CSS selectors are parsed, once, into functions that match bloks
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+'''
+import re
+from functools import lru_cache
+
+from blox.index import Index
+
+MAX_SELECTORS = 256
+TOKENS = re.compile('\\s*(?:(?P<child>>)|(?P<group>,))\\s*|(?P<descendant>\\s+)|#(?P<id>[-\\w]+)|\\.(?P<class>[-\\w]+)|'
+                    '\\[\\s*(?P<attribute>[-\\w]+)\\s*(?:(?P<operator>[~^$*|]?=)\\s*(?:"(?P<double>[^"]*)"|'
+                    '\'(?P<single>[^\']*)\'|(?P<bare>[^\\]\\s]+))\\s*)?\\]|(?P<tag>\\*|[-\\w]+)')
+OPERATORS = {'=': lambda value, expected: value == expected,
+             '~=': lambda value, expected: expected in value.split(),
+             '^=': lambda value, expected: bool(expected) and value.startswith(expected),
+             '$=': lambda value, expected: bool(expected) and value.endswith(expected),
+             '*=': lambda value, expected: bool(expected) and expected in value,
+             '|=': lambda value, expected: value == expected or value.startswith(expected + '-')}
+
+
+class Selector(object):
+    '''A single compiled CSS selector (without commas): a function matching bloks, plus the indexed attribute and
+       value its right most part requires (if any) so candidates can be looked up instead of walked
+    '''
+    __slots__ = ('matches', 'key')
+
+    def __init__(self, matches, key=None):
+        self.matches = matches
+        self.key = key
+
+    def __call__(self, blok):
+        return self.matches(blok)
+
+
+def value(blok, name):
+    '''Returns the value of the html attribute name of blok as a str, or None if it isn't set'''
+    attribute = getattr(blok, 'attribute_map', {}).get(name)
+    found = Index.value(blok, attribute) if attribute else getattr(blok, '_attributes', {}).get(name)
+    if found is None:
+        return None
+    return ' '.join(str(item) for item in found) if isinstance(found, (list, tuple, set)) else str(found)
+
+
+def compound(tag=None, id=None, classes=(), attributes=()):
+    '''Returns a function matching bloks against a single compound selector, such as a#main.link[href]'''
+    tag = tag.lower() if tag and tag != '*' else None
+    classes = frozenset(classes)
+
+    def matches(blok):
+        blok_tag = getattr(blok, 'tag', None)
+        if not blok_tag or not isinstance(blok_tag, str) or (tag and blok_tag.lower() != tag):
+            return False
+        if id is not None and getattr(blok, '_id', None) != id:
+            return False
+        if classes and not classes.issubset(getattr(blok, '_classes', ())):
+            return False
+        for name, operator, expected in attributes:
+            found = value(blok, name)
+            if found is None or (operator and not OPERATORS[operator](found, expected)):
+                return False
+        return True
+    return matches
+
+
+def combined(parts):
+    '''Returns a function matching bloks against a list of (combinator, compound matcher) parts, left to right'''
+    def matches(blok, position=len(parts) - 1):
+        combinator, part = parts[position]
+        if not part(blok):
+            return False
+        if position == 0:
+            return True
+
+        parent = getattr(blok, '_parent', None)
+        if combinator == '>':
+            return parent is not None and matches(parent, position - 1)
+        while parent is not None:
+            if matches(parent, position - 1):
+                return True
+            parent = getattr(parent, '_parent', None)
+        return False
+    return matches
+
+
+@lru_cache(maxsize=MAX_SELECTORS)
+def compiled(css):
+    '''Returns a tuple of Selectors, one per comma separated selector in css, parsing each css string only once'''
+    selectors = []
+    parts = []
+    current = dict(classes=[], attributes=[])
+    combinator = None
+    position = 0
+    css = css.strip()
+
+    def finish():
+        if len(current) == 2 and not current['classes'] and not current['attributes']:
+            raise ValueError('Invalid CSS selector: {0}'.format(css))
+        parts.append((combinator, compound(**current)))
+
+    while position < len(css):
+        token = TOKENS.match(css, position)
+        if not token or token.end() == position:
+            raise ValueError('Invalid CSS selector: {0}'.format(css))
+        position = token.end()
+        if token.group('tag'):
+            if len(current) > 2 or current['classes'] or current['attributes']:
+                raise ValueError('Invalid CSS selector: {0}'.format(css))
+            current['tag'] = token.group('tag')
+        elif token.group('id'):
+            current['id'] = token.group('id')
+        elif token.group('class'):
+            current['classes'].append(token.group('class'))
+        elif token.group('attribute'):
+            expected = next((group for group in token.group('double', 'single', 'bare') if group is not None), None)
+            current['attributes'].append((token.group('attribute').lower(), token.group('operator'), expected))
+        else:
+            finish()
+            if token.group('group'):
+                selectors.append(Selector(combined(parts), key(current)))
+                parts = []
+                combinator = None
+            else:
+                combinator = '>' if token.group('child') else ' '
+            current = dict(classes=[], attributes=[])
+    finish()
+    selectors.append(Selector(combined(parts), key(current)))
+    return tuple(selectors)
+
+
+def key(current):
+    '''Returns the (attribute, value) of a compound selector that an Index can look candidates up by, if any'''
+    if current.get('id'):
+        return ('id', current['id'])
+    elif current['classes']:
+        return ('classes', current['classes'][0])
+    elif current.get('tag') and current['tag'] != '*':
+        return ('tag', current['tag'].lower())
@@ -19,10 +19,9 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 OTHER DEALINGS IN THE SOFTWARE.
 
 '''
-import cgi
-
 from blox.base import Blok
 from blox.builder import Factory
+from blox.escaping import escape
 
 factory = Factory('text')
 
@@ -45,11 +44,17 @@ class Text(Blok):
         if value != self._value:
             self.emit('value_changed', value)
             self._value = value
+            self._changed()
 
     def output(self, to=None, *args, **kwargs):
         '''Outputs the set text'''
         to.write(str(self._value))
 
+    def output_bytes(self, buffer, *args, **kwargs):
+        '''Outputs the set text utf8 encoded to the end of a bytearray'''
+        buffer += str(self._value).encode('utf8')
+        return self
+
     def __call__(self, text):
         '''Updates the text value'''
         self.value = text
@@ -58,10 +63,24 @@ class Text(Blok):
 
 class UnsafeText(Text):
     '''Defines text that comes from an untrusted source, and should therefore be escaped'''
+    __slots__ = ('_escaped', )
+
+    def __init__(self, value=''):
+        super().__init__(value)
+        self._escaped = escape(str(value))
+
+    def _changed(self):
+        self._escaped = escape(str(self._value))
+        super()._changed()
 
     def output(self, to=None, *args, **kwargs):
-        '''Outputs the set text'''
-        to.write(cgi.escape(str(self._value)))
+        '''Outputs the set text, escaped once when it was set'''
+        to.write(self._escaped)
+
+    def output_bytes(self, buffer, *args, **kwargs):
+        '''Outputs the set text, escaped once when it was set, utf8 encoded to the end of a bytearray'''
+        buffer += self._escaped.encode('utf8')
+        return self
 
 
 class unsafe(object):
@@ -73,11 +92,11 @@ class unsafe(object):
         self.value = value
 
     def __str__(self):
-        return cgi.escape(str(self.value))
+        return escape(str(self.value))
 
 
 class unsafe_str(str):
     '''Creates a string that is explicity marked as unsafe'''
 
     def __str__(self):
-        return cgi.escape(super().__str__())
+        return escape(super().__str__())
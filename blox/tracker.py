@@ -0,0 +1,158 @@
+'''blox/tracker.py
+
+Defines a tracker that turns the changes made to a rendered tree of blox into minimal HTML patches
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+'''
+from blox.base import AbstractTag, observe
+from blox.escaping import escape
+
+
+class Tracker(object):
+    '''Records the state of a rendered tree of blox, so that diff can return only what has changed since
+
+       Every patch is a dict with an action ('replace', 'attribute' or 'text'), the path of child indexes leading
+       from the root to the changed blok and the changed blok's id when it has one. Replace and text patches
+       include the blok's new html, attribute patches the attribute name and new value (None once removed).
+    '''
+    __slots__ = ('root', 'snapshots')
+
+    def __init__(self, root):
+        self.root = root
+        self.snapshots = {}
+        self.record(root)
+
+    @staticmethod
+    def state(blok):
+        '''Returns what patches are generated from for a single blok, not including its children'''
+        if isinstance(blok, AbstractTag):
+            attributes = {}
+            for attribute in blok.render_attributes:
+                if hasattr(blok, attribute.object_attribute):
+                    value = attribute.render_value(blok)
+                    attributes[attribute.name] = value if attribute.safe else escape(value)
+            for name, value in blok.attribute_values():
+                if value:
+                    attributes[name] = str(value)
+            return attributes
+        elif not hasattr(blok, '_blox'):
+            return blok.render()
+
+    def record(self, blok):
+        '''Records the current state of blok and everything below it that changed since it was last recorded'''
+        stack = [blok]
+        while stack:
+            blok = stack.pop()
+            snapshot = self.snapshots.get(id(blok))
+            if snapshot is not None and snapshot[0] is blok and snapshot[1] == blok.version:
+                continue
+
+            children = tuple(getattr(blok, '_blox', ()))
+            self.snapshots[id(blok)] = (blok, blok.version, self.state(blok), children)
+            stack.extend(children)
+        observe(self.root)
+
+    def forget(self, blok):
+        '''Drops the recorded state of blok and everything below it'''
+        stack = [blok]
+        while stack:
+            snapshot = self.snapshots.pop(id(stack.pop()), None)
+            if snapshot is not None:
+                stack.extend(snapshot[3])
+
+    def diff(self):
+        '''Returns the patches that bring the last recorded rendering current, and records the current state'''
+        patches = []
+        if not self._diff(self.root, (), patches):
+            self.forget(self.root)
+            patches = [self.patch('replace', self.root, (), html=self.root.render())]
+        self.record(self.root)
+        return patches
+
+    def _diff(self, blok, path, patches):
+        '''Adds the patches needed to bring blok current, returning False if blok has to be replaced as a whole.
+           Walks down using an explicit stack, instead of recursing, so that even deeply nested blox can be diffed
+        '''
+        path = list(path)
+        children = self._changes(blok, path, patches)
+        if children is True or children is False:
+            return children
+
+        stack = [(blok, enumerate(children))]
+        while stack:
+            for index, child in stack[-1][1]:
+                path.append(index)
+                changes = self._changes(child, path, patches)
+                if changes is False:
+                    path.pop()
+                    while stack:
+                        replaced = self._replace(stack.pop()[0], path, patches)
+                        if stack:
+                            path.pop()
+                        if replaced:
+                            break
+                    else:
+                        return False
+                elif changes is not True:
+                    stack.append((child, enumerate(changes)))
+                else:
+                    path.pop()
+                    continue
+                break
+            else:
+                stack.pop()
+                if stack:
+                    path.pop()
+        return True
+
+    def _changes(self, blok, path, patches):
+        '''Adds the patches needed to bring blok itself current, returning its children to diff next -
+           or True if nothing below it needs diffing and False if it has to be replaced as a whole
+        '''
+        snapshot = self.snapshots.get(id(blok))
+        if snapshot is None or snapshot[0] is not blok:
+            return False
+        if snapshot[1] == blok.version:
+            return True
+
+        children = tuple(getattr(blok, '_blox', ()))
+        if len(children) != len(snapshot[3]) or any(new is not old for new, old in zip(children, snapshot[3])):
+            return self._replace(blok, path, patches)
+
+        state = self.state(blok)
+        if isinstance(blok, AbstractTag):
+            for name in set(state).union(snapshot[2]):
+                if state.get(name) != snapshot[2].get(name):
+                    patches.append(self.patch('attribute', blok, path, name=name, value=state.get(name)))
+        elif state != snapshot[2]:
+            patches.append(self.patch('text', blok, path, html=state))
+        return children
+
+    def _replace(self, blok, path, patches):
+        if not isinstance(blok, AbstractTag):
+            return False
+
+        for child in self.snapshots[id(blok)][3]:
+            self.forget(child)
+        patches.append(self.patch('replace', blok, path, html=blok.render()))
+        return True
+
+    @staticmethod
+    def patch(action, blok, path, **changes):
+        changes.update(action=action, path=tuple(path), id=getattr(blok, '_id', None))
+        return changes
@@ -90,6 +90,7 @@ setup(name='blox',
       url='https://github.com/timothycrosley/blox',
       license="MIT",
       packages=['blox'],
+      python_requires='>=3.5',
       requires=['connectable', 'lxml', 'cssselect', 'short'],
       install_requires=['connectable==1.2.0', 'lxml>=3.0.0', 'cssselect>=0.9.1', 'short==1.0.6'],
       cmdclass=cmdclass,
@@ -102,10 +103,8 @@ setup(name='blox',
                    'License :: OSI Approved :: MIT License',
                    'Programming Language :: Python',
                    'Programming Language :: Python :: 3',
-                   'Programming Language :: Python :: 3.2',
-                   'Programming Language :: Python :: 3.3',
-                   'Programming Language :: Python :: 3.4',
                    'Programming Language :: Python :: 3.5',
+                   'Programming Language :: Python :: 3.6',
                    'Topic :: Software Development :: Libraries',
                    'Topic :: Utilities'],
       **PyTest.extra_kwargs)
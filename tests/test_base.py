@@ -18,11 +18,17 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 OTHER DEALINGS IN THE SOFTWARE.
 
 """
+import asyncio
+import inspect
 from io import StringIO
 
 import pytest
 
-from blox.base import Blok, Blox, Invalid, NamedTag, Tag, TagWithChildren, Container
+from blox.cache import RenderCache
+from blox.escaping import escape
+from blox.base import (AbstractTag, Blok, Blox, Container, Invalid, NamedTag, Tag, TagWithChildren, Wildcard,
+                       batch)
+from blox.dom import B, Input
 from blox.text import Text, UnsafeText
 
 
@@ -54,6 +60,44 @@ class TestBlok(object):
     def test_str(self):
         str(self.blok) == self.blok.render(formatted=True)
 
+    def test_iter_render(self):
+        assert ''.join(self.blok.iter_render()) == self.blok.render()
+        assert ''.join(self.blok.iter_render(chunk_size=1)) == self.blok.render()
+        assert ''.join(self.blok.iter_render(formatted=True)) == self.blok.render(formatted=True)
+        for chunk in self.blok.iter_render(chunk_size=4):
+            assert chunk
+
+    def test_render_bytes(self):
+        buffer = bytearray()
+        rendered = self.blok.render_bytes(buffer)
+        assert isinstance(rendered, memoryview)
+        assert rendered.tobytes() == self.blok.render().encode('utf8')
+        if buffer:
+            with pytest.raises(BufferError):
+                self.blok.render_bytes(buffer)
+        rendered.release()
+        with self.blok.render_bytes(buffer) as rendered:
+            assert rendered.tobytes() == self.blok.render().encode('utf8')
+        assert self.blok.render_bytes(buffer).tobytes() == self.blok.render().encode('utf8')
+        assert bytes(Blox((self.blok, )).render_bytes(formatted=True)) == self.blok.render(formatted=True).encode()
+
+    def test_aoutput(self):
+        class Writer(object):
+            def __init__(self):
+                self.written = b''
+                self.drains = 0
+
+            def write(self, data):
+                self.written += data
+
+            async def drain(self):
+                self.drains += 1
+
+        writer = Writer()
+        asyncio.get_event_loop().run_until_complete(self.blok.aoutput(writer, drain_at=1, chunk_size=1))
+        assert writer.written == self.blok.render().encode('utf8')
+        assert writer.drains >= 1
+
 
 class TestInvalid(TestBlok):
     testing = Invalid
@@ -84,6 +128,11 @@ class TestUnsafeText(TestText):
         self.blok('<hi')
         assert self.blok.render() == '&lt;hi'
 
+    def test_escape(self):
+        assert escape('plain') == 'plain'
+        assert escape('a & <b>') == 'a &amp; &lt;b&gt;'
+        assert UnsafeText('<b>').render() == '&lt;b&gt;'
+
 
 class TestContainer(TestBlok):
     testing = Container
@@ -124,6 +173,111 @@ class TestContainer(TestBlok):
         self.blok(additional_text, 0)
         assert additional_text in self.blok
 
+    def test_iter_render_chunks(self):
+        blok = self.testing(Text('hi'), Text(' bacon'))
+        chunks = list(Blox((blok, blok)).iter_render(chunk_size=1))
+        assert len(chunks) > 1
+        assert ''.join(chunks) == blok.render() * 2
+
+    def test_freeze(self):
+        text = Text('hi')
+        blok = self.testing(text)
+        rendered = blok.render()
+        formatted = blok.render(formatted=True)
+        assert Blox((blok, )).freeze() == [blok]
+        assert blok.render() == rendered
+        assert blok.render(formatted=True) == formatted
+        assert ''.join(blok.iter_render()) == rendered
+
+        text('bye')
+        assert blok.render() == rendered.replace('hi', 'bye')
+
+        blok.freeze()
+        blok(Text('!'))
+        assert blok.render() == rendered.replace('hi', 'bye!')
+
+        blok.freeze()
+        blok.thaw()
+        blok[-1].value = '?'
+        assert blok.render() == rendered.replace('hi', 'bye?')
+
+    def test_cache(self):
+        render_cache = RenderCache()
+        text = Text('hi')
+        blok = self.testing(text).cache(render_cache)
+        rendered = blok.render()
+        assert blok.render() == rendered
+        assert ''.join(blok.iter_render()) == rendered
+        assert (render_cache.hits, render_cache.misses) == (2, 1)
+
+        version = blok.version
+        text('bye')
+        assert blok.version > version
+        assert blok.render() == rendered.replace('hi', 'bye')
+        blok(Text('!'))
+        assert blok.render() == rendered.replace('hi', 'bye!')
+        assert blok.render(formatted=True) == blok.uncache().render(formatted=True)
+
+    def test_clone(self):
+        text = Text('hi')
+        nested = Container(text)
+        blok = self.testing(nested).freeze()
+        copy = blok.clone()
+        assert type(copy) == type(blok)
+        assert copy.render() == blok.render() and copy.render(formatted=True) == blok.render(formatted=True)
+        assert copy[0] is not nested and copy[0][0] is not text
+        assert copy[0]._parent is copy.blox_container and copy[0][0]._parent is copy[0]
+
+        copy[0][0].value = 'bye'
+        assert 'bye' in copy.render()
+        assert 'bye' not in blok.render()
+        assert getattr(nested.clone(), '_parent', None) is None
+
+    def test_deep(self):
+        blok = self.testing()
+        nested = blok
+        for level in range(2000):
+            nested = nested(TagWithChildren(Text(str(level))))
+        rendered = blok.render()
+        assert '<>1999' + '</>' * 2000 in rendered and rendered.count('<>') == 2000
+        assert '1999' in blok.render(formatted=True)
+        assert ''.join(blok.iter_render()) == rendered and bytes(blok.render_bytes()) == rendered.encode('utf8')
+        assert ''.join(blok.iter_render(formatted=True)) == blok.render(formatted=True)
+        assert Blox((blok, )).query(value='1999')[0].value == '1999'
+        assert len(list(Blox((blok, )).walk())) >= 4001
+
+        blok.freeze()
+        nested[0].value = 'changed'
+        assert '<>changed</>' in blok.render() and blok.version > 0
+
+    def test_output_override(self):
+        class Custom(self.testing):
+            __slots__ = ()
+
+            def output(self, to=None, *args, **kwargs):
+                to.write('<custom/>')
+
+        blok = self.testing(Custom(self.testing(Text('inner'))))
+        assert '<custom/>' in blok.render() and 'inner' not in blok.render()
+        assert bytes(blok.render_bytes()) == blok.render().encode('utf8')
+        assert bytes(blok[0].render_bytes()) == b'<custom/>'
+        assert ''.join(blok.iter_render()) == blok.render()
+        custom = blok[0]
+        assert ''.join(custom.iter_render()) == ''.join(custom.iter_render(formatted=True)) == custom.render()
+
+        class Writer(object):
+            written = b''
+
+            def write(self, data):
+                self.written += data
+
+            async def drain(self):
+                pass
+
+        writer = Writer()
+        asyncio.get_event_loop().run_until_complete(custom.aoutput(writer))
+        assert writer.written == b'<custom/>'
+
     def test_set_item(self):
         additional_text = Text('more_text')
         self.blok[0] = additional_text
@@ -136,8 +290,130 @@ class TestTag(TestBlok):
     class testing(Tag):
         tag = 'testing'
 
+    def test_start_tag_cache(self):
+        tag = self.testing()
+        assert tag.render() == '<testing />'
+        assert tag.start_tag is tag.start_tag
+        assert tag.start_tag_bytes is tag.start_tag_bytes and tag.start_tag_bytes == b'<testing />'
+
+        tag.id = 'cached'
+        assert tag.render() == '<testing id="cached" />' and tag.start_tag_bytes == b'<testing id="cached" />'
+        del tag.id
+        tag.classes.add('one')
+        assert tag.render() == '<testing class="one" />'
+        tag.classes.discard('one')
+        tag.classes |= {'two'}
+        assert tag.render() == '<testing class="two" />'
+        tag['data-value'] = 'yes'
+        assert tag.render() == '<testing class="two" data-value="yes" />'
+        del tag['data-value']
+        tag.style = 'color: red'
+        assert tag.render() == '<testing class="two" style="color: red" />'
+        del tag.style
+        tag.classes = 'three'
+        assert tag.render() == '<testing class="three" />'
+
+        tag.attributes['data-direct'] = 'yes'
+        assert tag.render() == '<testing class="three" data-direct="yes" />'
+        tag.attributes.pop('data-direct')
+        assert tag.render() == '<testing class="three" />'
+        assert tag.clone().attributes.owner is not tag
+
+        read = self.testing()
+        assert read.render() == '<testing />'
+        read.id
+        read.classes
+        assert read.render() == AbstractTag.render_start_tag(read) == '<testing id="" class="" />'
+
+    def test_compact_attributes(self):
+        tag = self.testing(style='color: red', lang='en')
+        assert not hasattr(tag, '_attributes') and len(tag._values) == self.testing.style.value_index + 1
+        assert tag.render() == '<testing lang="en" style="color: red" />'
+        assert 'style' in tag and 'data-value' not in tag and tag['style'] == 'color: red'
+        tag['data-value'] = 'yes'
+        assert tag.attributes == {'data-value': 'yes'}
+        assert tag.attribute_values() == [('lang', 'en'), ('style', 'color: red'), ('data-value', 'yes')]
+        copy = tag.clone()
+        del tag.style
+        assert 'style' not in tag and copy.render() == '<testing lang="en" style="color: red" data-value="yes" />'
+        assert tag.render() == AbstractTag.render_start_tag(tag) == '<testing lang="en" data-value="yes" />'
+        assert self.testing.value_names[self.testing.lang.value_index] == 'lang'
+        assert self.testing.tabindex is self.testing.attribute_descriptors['tabindex']
+        assert hasattr(self.testing, 'hidden') and dict(inspect.getmembers(self.testing))['style'] is self.testing.style
+
+    def test_sparse_attributes(self):
+        assert not self.testing.sparse_values and Input.sparse_values
+        tag = Input(value='x', name='n', type='text')
+        assert tag._values == {Input.value.value_index: 'x'}
+        assert tag.render() == AbstractTag.render_start_tag(tag) == '<input name="n" type="text" value="x" />'
+        assert 'value' in tag and tag.value == 'x' and ('value', 'x') in tag.attribute_values()
+        copy = tag.clone()
+        del tag.value
+        assert 'value' not in tag and tag._values == {} and copy.value == 'x'
+        assert tag.render() == '<input name="n" type="text" />'
+
+    def test_generated_start_tag(self):
+        tag = self.testing(id='<one>', classes=['two'], style='three')
+        assert self.testing.render_start_tag is not AbstractTag.render_start_tag
+        assert tag.start_tag == '<testing id="&lt;one&gt;" class="two" style="three" />'
+        assert tag.start_tag == AbstractTag.render_start_tag(tag)
+        wildcard = Wildcard('wild')
+        wildcard.id = 'card'
+        assert wildcard.render() == '<wild id="card"></wild>'
+
 
 class TestTagWithChildren(TestContainer):
     expected_output = '<testing>hi bacon</testing>'
     class testing(TagWithChildren):
         tag = 'testing'
+
+
+class TestBlox(object):
+
+    def test_batch(self):
+        texts = Blox(Text(str(number)) for number in range(3))
+        received = []
+        def changed(value):
+            received.append(value)
+        for text in texts:
+            text.connect('value_changed', changed)
+
+        with texts.batch():
+            for text in texts:
+                text.value = 'changed'
+                text.value = 'twice'
+            assert received == []
+        assert received == ['twice', 'twice', 'twice']
+
+        texts.update_text(('a', 'b', 'c'))
+        assert received[3:] == ['a', 'b', 'c']
+
+        notified = []
+        with texts.batch(lambda signal, changed: notified.append((signal, dict(changed)))):
+            texts.update_text(('d', 'e', 'f'))
+            texts[0].value = 'g'
+        assert received[6:] == [] and notified == [('value_changed', dict(zip(texts, 'gef')))]
+
+        cells = Blox(TagWithChildren() for _ in range(3))
+        with batch(lambda signal, changed: notified.append((signal, list(changed)))):
+            cells.add_classes('one')
+            with batch():
+                texts[1].value = 'h'
+        assert notified[1:] == [('value_changed', [texts[1]])] and received[6:] == []
+        assert Text('x').emit('value_changed', 'x', gather=True) == []
+
+    def test_bulk_changes(self):
+        cells = Blox(TagWithChildren(Text('old')) for _ in range(3))
+        cells.set(style='color: red', id='cell')
+        cells.add_classes('one', 'two')
+        cells.remove_classes('one')
+        cells.update_text(('a', 'b', 'c'))
+        assert [cell.render() for cell in cells] == ['< id="cell" class="two" style="color: red">{0}</>'.format(text)
+                                                     for text in 'abc']
+        bold = Blox((B(text='old'), ))
+        text = bold[0][0]
+        bold.update_text(('new', ))
+        assert bold[0].render() == '<b>new</b>' and bold[0][0] is not text
+
+        cells.style = 'color: blue'
+        assert all(cell.style == 'color: blue' for cell in cells)
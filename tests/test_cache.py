@@ -0,0 +1,139 @@
+"""tests/test_cache.py.
+
+Tests to ensure the render cache stores, evicts and reports on rendered blox as intended
+
+Copyright (C) 2015 Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+import gc
+from sys import getsizeof
+from threading import Thread
+
+import pytest
+
+from blox.cache import RenderCache
+from blox.base import Blok
+from blox.dom import Div, Span
+from blox.text import Text
+
+
+def test_versions():
+    '''Test to ensure a stored rendering is only used while the version it was stored at is current'''
+    render_cache = RenderCache()
+    blok = Div()
+    render_cache.set(blok, None, 1, 'rendered')
+    assert render_cache.get(blok, None, 1) == 'rendered'
+    assert render_cache.get(blok, None, 2) is None
+    assert render_cache.get(blok, (0, '  '), 1) is None
+    assert render_cache.stats() == {'entries': 1, 'size': getsizeof('rendered'), 'max_size': render_cache.max_size,
+                                    'hits': 1, 'misses': 2, 'evictions': 0}
+
+
+def test_eviction():
+    '''Test to ensure the least recently used renderings are evicted once the cache is full'''
+    render_cache = RenderCache(max_size=getsizeof('one') * 2)
+    first, second, third = Div(), Div(), Div()
+    render_cache.set(first, None, 0, 'one')
+    render_cache.set(second, None, 0, 'two')
+    assert render_cache.get(first, None, 0) == 'one'
+    render_cache.set(third, None, 0, 'six')
+    assert render_cache.get(second, None, 0) is None
+    assert render_cache.get(first, None, 0) == 'one'
+    assert render_cache.evictions == 1
+    assert len(render_cache) == 2
+
+    render_cache.set(Div(), None, 0, 'too large' * 10)
+    assert len(render_cache) == 2
+
+    render_cache.clear()
+    assert render_cache.stats()['entries'] == render_cache.size == render_cache.hits == 0
+
+
+def test_nested_changes():
+    '''Test to ensure changes deep inside a cached subtree propagate up to it'''
+    render_cache = RenderCache()
+    text = Text('text')
+    span = Span(text)
+    page = Div(Div(span)).cache(render_cache)
+    assert page.render() == '<div><div><span>text</span></div></div>'
+
+    span.id = 'changed'
+    assert page.render() == '<div><div><span id="changed">text</span></div></div>'
+    text.value = 'more'
+    assert page.render() == '<div><div><span id="changed">more</span></div></div>'
+    assert page.render() == '<div><div><span id="changed">more</span></div></div>'
+    assert render_cache.hits == 1
+
+
+def test_collected():
+    '''Test to ensure the cache doesn't keep blox alive, dropping their renderings once they are collected'''
+    render_cache = RenderCache()
+    page = Div(Span(Text('text'))).cache(render_cache)
+    page.render()
+    page.render(formatted=True)
+    kept = Div().cache(render_cache)
+    kept.render()
+    assert len(render_cache) == 3
+
+    del page
+    gc.collect()
+    assert len(render_cache) == 1 and render_cache.size == getsizeof(kept.render())
+    assert list(render_cache.references) == [id(kept)]
+
+
+def test_failed_render():
+    '''Test to ensure a render that raises leaves cached and frozen containers as they were'''
+    class Failing(Blok):
+        def output(self, to=None, *args, **kwargs):
+            raise ValueError('failed')
+
+    render_cache = RenderCache()
+    page = Div(Failing()).cache(render_cache)
+    with pytest.raises(ValueError):
+        page.render()
+    assert page._render_cache is render_cache
+
+    frozen = Div(Text('text')).freeze()
+    frozen(Failing())
+    frozen._frozen = {None: 'stored'}
+    with pytest.raises(ValueError):
+        frozen.render(formatted=True)
+    assert frozen.render() == 'stored'
+
+
+def test_threads():
+    '''Test to ensure renders sharing one small cache from many threads don't interfere with each other'''
+    pages = [Div(Span(Text(str(number)))) for number in range(50)]
+    render_cache = RenderCache(max_size=getsizeof(pages[0].render()) * 10)
+    for page in pages:
+        page.cache(render_cache)
+    failures = []
+
+    def render():
+        try:
+            for _ in range(200):
+                for number, page in enumerate(pages):
+                    assert page.render() == '<div><span>{0}</span></div>'.format(number)
+        except Exception as exception:
+            failures.append(exception)
+
+    threads = [Thread(target=render) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not failures and render_cache.evictions and len(render_cache) <= 10
@@ -19,11 +19,277 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 OTHER DEALINGS IN THE SOFTWARE.
 
 """
+import os
+from io import BytesIO, StringIO
+
 import pytest
 
 import blox.compile
+from blox.containers import Lazy
+from blox.dom import Div, P, Span
+from blox.precompiled import Templates
+from blox.text import Text, unsafe
 
 
 def test_compile():
     '''Test to ensure blox works as expected'''
     pass
+
+
+@pytest.mark.skipif(bool(blox.compile.Cython), reason='Cython.inline keeps its own cache')
+def test_disk_cache(tmpdir, monkeypatch):
+    '''Test to ensure compiled templates are stored on disk and reused without re-parsing'''
+    html = '<div id="greeting"><span>Hello</span></div>'
+    template = blox.compile.string(html, cache_dir=str(tmpdir))
+    assert len(tmpdir.listdir()) == 1
+    assert tmpdir.listdir()[0].ext == blox.compile.CACHE_SUFFIX
+
+    def not_parsed(*args, **kwargs):
+        raise AssertionError('template should have been loaded from the disk cache')
+    monkeypatch.setattr(blox.compile, '_to_python', not_parsed)
+    blox.compile.templates.clear()
+    cached = blox.compile.string(html, cache_dir=str(tmpdir))
+    assert cached().render() == template().render() == html
+    assert cached().greeting.render() == template().greeting.render()
+
+    with pytest.raises(AssertionError):
+        blox.compile.string(html, cache_dir=str(tmpdir), start_on='span')
+
+
+@pytest.mark.skipif(bool(blox.compile.Cython), reason='Cython.inline keeps its own cache')
+def test_disk_cache_corrupt(tmpdir):
+    '''Test to ensure an unreadable cache entry is replaced instead of breaking compilation'''
+    html = '<p>Cached</p>'
+    blox.compile.string(html, cache_dir=str(tmpdir))
+    tmpdir.listdir()[0].write_binary(b'\x00garbage')
+    blox.compile.templates.clear()
+    assert blox.compile.string(html, cache_dir=str(tmpdir))().render() == html
+    blox.compile.templates.clear()
+    assert blox.compile.string(html, cache_dir=str(tmpdir))().render() == html
+
+
+def test_memory_cache():
+    '''Test to ensure templates built from the same source and arguments are reused in process'''
+    templates = blox.compile.templates
+    templates.clear()
+    html = '<ul><li class="item">One</li><li class="item">Two</li></ul>'
+    template = blox.compile.string(html, items='.item')
+    assert blox.compile.string(html, items='.item') is template
+    assert blox.compile.string(html, items='li') is not template
+    assert blox.compile.string(html, ignore=['.item']) is not template
+    assert blox.compile.string(html, ignore=['.item']) is blox.compile.string(html, ignore=['.item'])
+    assert template() is not template()
+    assert len(template().items) == 2
+    assert templates.stats() == {'entries': 3, 'max_size': blox.compile.MAX_TEMPLATES, 'hits': 3, 'misses': 3,
+                                 'evictions': 0}
+
+    templates.max_size = 2
+    blox.compile.string('<p>evicts</p>')
+    assert len(templates) == 2
+    assert templates.evictions == 2
+    assert blox.compile.string(html, items='.item') is not template
+
+    templates.max_size = blox.compile.MAX_TEMPLATES
+    templates.clear()
+    assert templates.stats()['entries'] == templates.hits == templates.misses == 0
+
+
+def test_render_only():
+    '''Test to ensure the render only target outputs the same html as the built template, with accessors as slots'''
+    html = '<div id="page" class="x"><span accessor="name">Hello <b>you</b></span>!</div>'
+    template = blox.compile.string(html)
+    render = blox.compile.string(html, render_only=True)
+    assert render() == template().render() == '<div id="page" class="x"><span>Hello<b>you</b></span>!</div>'
+    assert render(name='Tim') == '<div id="page" class="x">Tim!</div>'
+
+    built = template()
+    built.name = 'Tim'
+    assert render(name='Tim') == built.render()
+    assert render(page=Span(Text('replaced'))) == '<span>replaced</span>'
+    assert render(name=unsafe('<Tim>')) == '<div id="page" class="x">&lt;Tim&gt;!</div>'
+    with pytest.raises(TypeError):
+        render(missing='value')
+
+    static = blox.compile.string('<div><p>static</p></div>', render_only=True)
+    assert static() == '<div><p>static</p></div>'
+    with pytest.raises(TypeError):
+        static(missing='value')
+
+
+def test_constant_folding():
+    '''Test to ensure static subtrees are built as a single pre-rendered node, leaving dynamic parts as blox'''
+    html = ('<div id="page"><ul class="menu"><li>One</li><li>Two <i>2</i></li></ul>'
+            '<span accessor="name">Hi <b>you</b></span><p class="item">Para</p></div>')
+    unfolded = blox.compile.string(html, items='.item')()
+    assert len(unfolded.blox.query(tag='li')) == 2
+
+    template = blox.compile.string(html, fold=True, items='.item')()
+    assert template.render() == unfolded.render() and not template.blox.query(tag='li')
+    assert template.render() == ('<div id="page"><ul class="menu"><li>One</li><li>Two<i>2</i></li></ul>'
+                                 '<span>Hi<b>you</b></span><p class="item">Para</p></div>')
+    menu, name, item = template.page
+    assert type(menu) == Text
+    assert menu.value == '<ul class="menu"><li>One</li><li>Two<i>2</i></li></ul>'
+    assert name is template.name and type(name[1]) == Text
+    assert list(template.items) == [item]
+    assert item.classes == {'item'}
+
+    static = blox.compile.string('<p>All <b>static</b></p>', fold=True)()
+    assert len(static) == 1 and type(static[0]) == Text
+    assert type(blox.compile.string('<p>All <b>static</b></p>')()[0]) != Text
+
+
+def test_prototype():
+    '''Test to ensure prototype templates are cloned instead of rebuilt, with accessors bound to the clone'''
+    html = '<div id="page"><ul><li class="item" id="first">One</li><li class="item">Two</li></ul><p>Static</p></div>'
+    built = blox.compile.string(html, items='.item')()
+    template = blox.compile.string(html, prototype=True, items='.item')
+    first, second = template(), template()
+    assert first is not second
+    assert first.render() == second.render() == built.render()
+
+    first.first.text = 'Changed'
+    first.first.classes.add('active')
+    assert first.items[0] is first.first
+    assert first.first._parent is first.page[0]
+    assert 'Changed' in first.render() and 'active' in first.render()
+    assert second.render() == built.render()
+
+    first.first = 'Replaced'
+    assert '>Replaced<' in first.render()
+    assert second.render() == built.render()
+
+
+def test_precompile_directory(tmpdir, capsys):
+    '''Test to ensure a directory of templates can be precompiled and loaded back without recompiling'''
+    source = tmpdir.mkdir('source')
+    source.join('index.html').write('<div id="page"><p>Index</p></div>')
+    source.mkdir('pages').join('about.html').write('<span accessor="name">About</span>')
+    source.join('notes.txt').write('not a template')
+    output = tmpdir.join('output')
+
+    blox.compile.main([str(source), str(output), '--processes', '2'])
+    assert capsys.readouterr().out.split() == [os.path.join('index.html'), os.path.join('pages', 'about.html')]
+    assert output.join('pages', 'about.py').check()
+    assert not output.join('notes.py').check()
+
+    templates = Templates(str(output))
+    assert 'index.html' in templates and 'notes.txt' not in templates
+    index = templates['index.html']
+    assert templates['index.html'] is index
+    assert index().render() == '<div id="page"><p>Index</p></div>'
+    assert index().page.render() == blox.compile.string('<div id="page"><p>Index</p></div>')().page.render()
+    assert templates[os.path.join('pages', 'about.html')]().render() == '<span>About</span>'
+
+    blox.compile.directory(str(source), str(output), render_only=True, processes=1)
+    assert Templates(str(output))['pages/about.html'](name='Blox') == 'Blox'
+    assert Templates(str(tmpdir.mkdir('empty')), source=str(source))['index.html']().render() == index().render()
+
+
+def test_precompile_cython(tmpdir):
+    '''Test to ensure templates precompiled with Cython load from their extension, or fall back to pure Python'''
+    source = tmpdir.mkdir('source')
+    source.join('index.html').write('<div id="page"><p>Index</p></div>')
+    output = tmpdir.join('output')
+    blox.compile.directory(str(source), str(output), processes=1, cython=True)
+
+    compiled = blox.compile.cythonize(str(output.join('index.py')), str(output.join('__bloxcython__')))
+    assert (compiled is None) == (not blox.compile.Cython)
+    template = Templates(str(output))['index.html']
+    assert template().render() == '<div id="page"><p>Index</p></div>'
+    assert template().page is not None
+
+
+def test_lazy():
+    '''Test to ensure lazy templates only build the sections that are accessed, rendering the rest pre-rendered'''
+    html = ('<div id="page"><section class="header"><h1 id="title">Title <i>!</i></h1><p>Static</p></section>'
+            '<section><span accessor="name">Name <b id="deep">deep</b></span></section>'
+            '<ul><li class="item">Item</li></ul></div>')
+    eager = blox.compile.string(html, items='.item')
+    template = blox.compile.string(html, lazy=True, items='.item')
+    page = template()
+    header, body, items = page.page
+    assert type(header) == Lazy and type(body) == Lazy and not header.built and not body.built
+    assert page.render() == eager().render()
+    assert page.render(formatted=True) == eager().render(formatted=True)
+    assert len(page.items) == 1 and page.items[0] is items[0]
+
+    page = template()
+    header, body, items = page.page
+    page.deep.text = 'changed'
+    assert body.built and not header.built
+    assert page.name._parent.built
+    assert '<b id="deep">changed</b>' in page.render()
+
+    page = template()
+    page.title = 'Replaced'
+    assert page.render() == eager().render().replace('<h1 id="title">Title<i>!</i></h1>', 'Replaced')
+    assert template().clone().render() == eager().render()
+
+    page = template()
+    assert page.blox.select('#deep')[0] is page.deep and page.blox.query(id='title')[0] is page.title
+    assert list(page.index().page.blox.select('.item')) == list(page.items)
+    page = template().index()
+    assert page.blox.select('b')[0] is page.deep
+
+
+def test_resolved_classes():
+    '''Test to ensure compiled templates construct blox through direct class references resolved at compile time'''
+    html = '<div id="page"><custom-tag id="custom">Custom</custom-tag><p id="para">Text</p></div>'
+    python = blox.compile._to_python(blox.compile._parse(html))
+    assert 'from blox.dom import Div\n' in python and 'from blox.dom import P\n' in python
+    assert "Wildcard('custom-tag')" in python and "factory(" not in python
+
+    template = blox.compile.string(html)()
+    assert type(template.page) == Div and type(template.para) == P
+    assert template.render() == '<div id="page"><custom-tag id="custom">Custom</custom-tag><p id="para">Text</p></div>'
+    assert blox.compile._describe(Div) is blox.compile._describe(Div)
+
+
+def test_stream():
+    '''Test to ensure templates can be compiled incrementally from a stream of html'''
+    html = ('<div id="page" class="report">Report <b>bold</b> tail<table><tr><td>1</td><td>2</td></tr>'
+            '<tr><td><b id="cell">3</b></td><td>4<custom-tag>x</custom-tag></td></tr></table>end</div>')
+    expected = blox.compile.string(html, use_short=False)().render()
+    assert blox.compile.stream(StringIO(html))().render() == expected
+
+    template = blox.compile.stream(BytesIO(html.encode('utf8')), chunk_size=8)()
+    assert template.render() == expected
+    template.cell.text = 'changed'
+    assert '<b id="cell">changed</b>' in template.render()
+    assert 'report' in template.page.classes
+
+    document = ('<!DOCTYPE html><html><head><title id="title">Title</title></head>'
+                '<body><p id="para">Hi</p></body></html>')
+    template = blox.compile.stream(StringIO(document), chunk_size=16)()
+    template.title(Text('!'))
+    assert template.render() == ('<!DOCTYPE html><html><head><title id="title">Title!</title></head>'
+                                 '<body><p id="para">Hi</p></body></html>')
+
+    static = '<html><head><title>T</title></head><body><p>Hi <b>there</b></p></body></html>'
+    expected = blox.compile.string(static, use_short=False)().render()
+    assert expected == blox.compile.convert(static).render()
+    assert blox.compile.stream(StringIO(static))().render() == expected
+    assert blox.compile.stream(StringIO('<!DOCTYPE html>' + static), chunk_size=8)().render() == expected
+
+
+def test_convert(monkeypatch):
+    '''Test to ensure html can be converted directly into blox without generating any code'''
+    html = ('<div id="page" class="comment">Hi <b>there</b><!-- hidden --><p>Para <i data-x="1">it</i> tail</p>'
+            '<custom-tag>x</custom-tag>end</div>')
+    expected = blox.compile.string(html, use_short=False)().render()
+    monkeypatch.setattr(blox.compile, 'exec', None, raising=False)
+    monkeypatch.setattr(blox.compile, 'compile', None, raising=False)
+    converted = blox.compile.convert(html)
+    assert converted.render() == expected
+    assert type(converted[0]) == Div and converted[0].id == 'page'
+    assert blox.compile.convert(blox.compile._parse(html, use_short=False)).render() == expected
+
+    sanitized = ('<p title="&quot;&gt;&lt;img src=x onerror=alert(1)&gt;" id="a&quot;b" class="x&lt;y">'
+                 '&lt;script&gt;alert(1)&lt;/script&gt; &amp; <b>bold</b> &lt;tail&gt;</p>')
+    converted = blox.compile.convert(sanitized)
+    assert converted.render() == ('<p id="a&quot;b" class="x&lt;y" '
+                                  'title="&quot;&gt;&lt;img src=x onerror=alert(1)&gt;">'
+                                  '&lt;script&gt;alert(1)&lt;/script&gt; &amp;<b>bold</b>&lt;tail&gt;</p>')
+    assert '<script>' not in converted.render() and '<img' not in converted.render()
+    assert converted[0]['title'] == '&quot;&gt;&lt;img src=x onerror=alert(1)&gt;' and converted[0].id == 'a"b'
@@ -0,0 +1,98 @@
+"""tests/test_index.py.
+
+Tests to ensure indexed queries find the same blox as walking the tree, and stay current as it changes
+
+Copyright (C) 2015 Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from blox.base import Blox
+from blox.dom import A, Div, Span
+from blox.text import Text
+
+
+def page():
+    root = Div(id='root')
+    for number in range(10):
+        row = root(Div(id='row{0}'.format(number), classes=('row', 'even' if number % 2 == 0 else 'odd')))
+        row(Span(Text(str(number)), classes=('cell', )))
+        row(A(href='/{0}'.format(number)))
+    return root
+
+
+def test_query():
+    '''Test to ensure indexed queries return the same bloks a walk would'''
+    walked = page()
+    indexed = page().index('href')
+    assert indexed._index.root is indexed
+    for query in (dict(id='row3'), dict(classes=['row']), dict(classes=['row', 'odd']), dict(tag='span'),
+                  dict(href='/4'), dict(tag='a', href='/5'), dict(id='missing')):
+        assert ([repr(blok) for blok in Blox((indexed, )).query(**query)] ==
+                [repr(blok) for blok in Blox((walked, )).query(**query)])
+    assert len(indexed.blox.query(id='root')) == 0
+    assert len(indexed[2].blox.query(classes=['cell'])) == 1
+    assert indexed._index.candidates(href='/4')
+
+
+def test_changes():
+    '''Test to ensure the index follows attribute changes, additions and removals'''
+    root = page().index()
+    root[0].id = 'first'
+    root[1].classes.add('selected')
+    assert Blox((root, )).query(id='first')[0] is root[0]
+    assert not Blox((root, )).query(id='row0')
+    assert Blox((root, )).query(classes=['selected'])[0] is root[1]
+
+    added = root(Div(Span(id='nested'), id='added'))
+    assert Blox((root, )).query(id='nested')[0] is added[0]
+    root -= added
+    assert not Blox((root, )).query(id='nested') and added._index is None
+    del root[0]
+    assert not Blox((root, )).query(id='first')
+
+    root[0].style = 'a'
+    root(Div(id='new', classes=('row', )), position=0)
+    walked = root.clone()
+    assert getattr(walked, '_index', None) is None
+    for query in (dict(tag='div'), dict(classes=['row'])):
+        assert ([repr(blok) for blok in Blox((root, )).query(**query)] ==
+                [repr(blok) for blok in Blox((walked, )).query(**query)])
+    assert [blok.id for blok in Blox((root[1], root[0])).query(tag='div')] == ['row1', 'new']
+
+    root.unindex()
+    assert root._index is None and root[0]._index is None
+    assert Blox((root, )).query(classes=['selected'])[0] is root[1]
+
+
+def test_order():
+    '''Test to ensure indexed queries keep document order through insertions, moves and reordering'''
+    root = Div(id='root').index()
+    for number in range(5):
+        root(Span(classes=('cell', ), id=str(number)))
+    root(Span(classes=('cell', ), id='first'), position=0)
+    for _ in range(40):
+        root.blox.insert(2, Span(classes=('cell', ), id='between'))
+    root.blox.extend([Span(classes=('cell', ), id='extended'), Span(classes=('cell', ), id='last')])
+    root.blox[-1] = Span(classes=('cell', ), id='replaced')
+    walked = root.clone()
+    assert ([blok.id for blok in Blox((root, )).query(classes=['cell'])] ==
+            [blok.id for blok in Blox((walked, )).query(classes=['cell'])])
+
+    for reorder in (root.blox.reverse, lambda: root.blox.sort(key=lambda blok: blok.id)):
+        reorder()
+        assert ([blok.id for blok in Blox((root, )).query(classes=['cell'])] ==
+                [blok.id for blok in root.blox])
+    assert Blox((root, )).query(id='first')[0] is root.blox[-2]
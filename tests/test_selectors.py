@@ -0,0 +1,74 @@
+"""tests/test_selectors.py.
+
+Tests to ensure CSS selectors find the expected blox, with and without an index
+
+Copyright (C) 2015 Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+import pytest
+
+from blox.base import Blox, Wildcard
+from blox.dom import A, LI, UL, Div, Span
+from blox.selectors import compiled
+
+
+def page():
+    root = Div(id='root', classes=('page', ))
+    navigation = root(UL(classes=('nav', )))
+    for number in range(3):
+        item = navigation(LI(classes=('item', 'first' if number == 0 else 'rest')))
+        item(A(href='/page{0}'.format(number), id='link{0}'.format(number)))
+    root(Span(id='main'))['data-role'] = 'main content'
+    return root
+
+
+@pytest.mark.parametrize('indexed', (False, True))
+def test_select(indexed):
+    '''Test to ensure selectors match by tag, id, class, attribute, descendant and child'''
+    root = page().index() if indexed else page()
+    def ids(css):
+        return [blok.id for blok in root.select(css)]
+
+    assert ids('a') == ['link0', 'link1', 'link2']
+    assert ids('#link1') == ['link1']
+    assert ids('ul > li.first a') == ['link0']
+    assert ids('div > a') == []
+    assert ids('div a[href^="/page"][href$="2"]') == ['link2']
+    assert ids('[data-role~=main]') == ['main']
+    assert ids('li.rest > a, #main') == ['link1', 'link2', 'main']
+    assert len(root.select('.item')) == 3 and len(root.select('*')) == 9
+    assert ids('DIV.page') == ['root'] and Blox(root).select('div') == Blox()
+
+    root[0][1](Span(id='added', classes=('new', )))
+    assert ids('.nav .new') == ['added']
+
+    assert ids('#main, a') == ['link0', 'link1', 'link2', 'main']
+    root[0][0][0].style = 'color: red'
+    assert ids('a') == ['link0', 'link1', 'link2']
+    custom = root(Wildcard('My-Tag'))
+    custom.id = 'custom'
+    assert ids('my-tag') == ids('MY-TAG') == ['custom'] and root.blox.query(tag='My-Tag')[0] is custom
+
+
+def test_compiled():
+    '''Test to ensure selectors are only parsed once, and invalid ones are reported'''
+    assert compiled('ul > li a') is compiled('ul > li a')
+    assert compiled('#link1')[0].key == ('id', 'link1') and compiled('a.item')[0].key == ('classes', 'item')
+    assert compiled('[href]')[0].key is None
+    for invalid in ('', 'div >', '> a', 'a[', 'a!b', 'a,'):
+        with pytest.raises(ValueError):
+            compiled(invalid)
@@ -0,0 +1,99 @@
+"""tests/test_tracker.py.
+
+Tests to ensure changes to rendered blox are turned into minimal patches
+
+Copyright (C) 2015 Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from blox.containers import Container
+from blox.dom import Div, Span
+from blox.text import Text
+from blox.tracker import Tracker
+
+
+def test_no_changes():
+    '''Test to ensure an untouched tree produces no patches'''
+    tracker = Tracker(Div(Span(Text('hi'))))
+    assert tracker.diff() == []
+
+
+def test_text_and_attribute_changes():
+    '''Test to ensure text and attribute changes are patched in place'''
+    text = Text('hi')
+    span = Span(text, id='greeting')
+    other = Span(Text('there'))
+    tracker = Tracker(Div(span, other))
+
+    text.value = 'bye'
+    other.classes.add('highlighted')
+    other['title'] = 'Other'
+    assert sorted(tracker.diff(), key=lambda patch: (patch['path'], patch.get('name', ''))) == [
+        {'action': 'text', 'path': (0, 0), 'id': None, 'html': 'bye'},
+        {'action': 'attribute', 'path': (1, ), 'id': None, 'name': 'class', 'value': 'highlighted'},
+        {'action': 'attribute', 'path': (1, ), 'id': None, 'name': 'title', 'value': 'Other'}]
+    assert tracker.diff() == []
+
+    del other['title']
+    span.id = 'farewell'
+    assert sorted(tracker.diff(), key=lambda patch: patch['path']) == [
+        {'action': 'attribute', 'path': (0, ), 'id': 'farewell', 'name': 'id', 'value': 'farewell'},
+        {'action': 'attribute', 'path': (1, ), 'id': None, 'name': 'title', 'value': None}]
+
+
+def test_child_changes():
+    '''Test to ensure adding or removing children replaces the closest tag containing them'''
+    inner = Container(Text('a'))
+    span = Span(inner)
+    root = Div(Div(Text('static')), span)
+    tracker = Tracker(root)
+
+    inner(Text('b'))
+    assert tracker.diff() == [{'action': 'replace', 'path': (1, ), 'id': None, 'html': '<span>ab</span>'}]
+    inner[1].value = 'c'
+    assert tracker.diff() == [{'action': 'text', 'path': (1, 0, 1), 'id': None, 'html': 'c'}]
+
+    root(Text('!'))
+    assert tracker.diff() == [{'action': 'replace', 'path': (), 'id': None,
+                               'html': '<div><div>static</div><span>ac</span>!</div>'}]
+
+    container = Container(Text('x'))
+    tracker = Tracker(container)
+    container(Text('y'))
+    assert tracker.diff() == [{'action': 'replace', 'path': (), 'id': None, 'html': 'xy'}]
+
+
+def test_deep():
+    '''Test to ensure deeply nested trees are diffed without reaching the recursion limit'''
+    root = nested = Div()
+    for level in range(10000):
+        nested = nested(Div(Text(str(level))))
+    tracker = Tracker(root)
+    assert tracker.diff() == []
+
+    nested[0].value = 'changed'
+    nested.style = 'deepest'
+    path = (0, ) + (1, ) * 9999
+    assert sorted(tracker.diff(), key=lambda patch: patch['action']) == [
+        {'action': 'attribute', 'path': path, 'id': None, 'name': 'style', 'value': 'deepest'},
+        {'action': 'text', 'path': path + (0, ), 'id': None, 'html': 'changed'}]
+
+    inner = Container(Text('a'))
+    nested(inner)
+    nested(Text('!'))
+    inner(Text('b'))
+    assert tracker.diff() == [{'action': 'replace', 'path': path, 'id': None,
+                               'html': '<div style="deepest">changedab!</div>'}]